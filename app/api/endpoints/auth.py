@@ -1,6 +1,6 @@
 from datetime import timedelta
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi import Depends, HTTPException, status, APIRouter
+from fastapi import Depends, HTTPException, Request, status, APIRouter
 from typing import Annotated
 
 from app.core.config import settings
@@ -12,9 +12,11 @@ router = APIRouter()
 @router.post("/token")
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    request: Request,
 ) -> Token:
     user = await authenticate_user(
-        form_data.username, form_data.password
+        form_data.username, form_data.password,
+        request.client.host if request.client else None
     )
     if not user:
         raise HTTPException(
@@ -3,13 +3,16 @@ from typing import Annotated
 
 from app.core.auth import *
 from app.core.services.codes import code_counts
+from app.core.services.inventory import code_inventory
 
 router = APIRouter()
 
 
 @router.get("/count")
 async def get_code_counters(
-    _: Annotated[DashboardUser, Depends(get_current_user)],
+    _: Annotated[DashboardUser, Depends(get_token_user)],
 ):
+    if code_inventory.loaded:
+        return code_inventory.snapshot()
     code_counters = await code_counts()
     return code_counters
@@ -7,8 +7,10 @@ from app.core.services.participations import accept_participation, fetch_partici
 from app.core.services.dashboard_users import fetch_dashboard_users, delete_dashboard_user_by_id
 from app.core.services.logs import save_participation_log
 from app.schemas.participation import Status
-from app.chatbot.flow import FLOW
+from app.chatbot.flow import FLOW_GRAPH
 from app.chatbot.user_flow import FlowManager
+from app.chatbot.conversations import conversation_executor, LeaseLostError
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -22,23 +24,34 @@ class AcceptRequest(BaseModel):
 async def handle_accept(ticket_id, current_user: DashboardUserInDB, serial_number=None, rejection_reason=None):
     try:
         participation = await fetch_participation_by_id(ticket_id)
-        user = participation.user
-        if participation.status != Status.COMPLETE.value:
-            raise ValueError("Participation cannot be accepted")
-        result = await accept_participation(participation, serial_number)
-        if rejection_reason:
-            participation.rejection_reason = rejection_reason
-            await update_participation(participation.id, participation)
-            await save_participation_log(ticket_id, current_user, {'interaction_type': 'rejected'})
-        else:
-            await save_participation_log(ticket_id, current_user, {'interaction_type': 'accepted'})
-
-        flow_manager = FlowManager(FLOW, user, participation)
-        await flow_manager.execute(response=result)
+        # Nothing is written until the conversation is ours, so a busy one can be retried
+        async with conversation_executor.conversation(participation.user.phone):
+            participation = await fetch_participation_by_id(ticket_id)
+            user = participation.user
+            if participation.status != Status.COMPLETE.value:
+                raise ValueError("Participation cannot be accepted")
+            result = await accept_participation(participation, serial_number)
+            if rejection_reason:
+                participation.rejection_reason = rejection_reason
+                await update_participation(participation.id, participation)
+                await save_participation_log(ticket_id, current_user, {'interaction_type': 'rejected'})
+            else:
+                await save_participation_log(ticket_id, current_user, {'interaction_type': 'accepted'})
+
+            flow_manager = FlowManager(FLOW_GRAPH, user, participation)
+            await flow_manager.execute(response=result)
     except Exception as e:
         raise e
 
 
+def conversation_unavailable(e: Exception, response: Response) -> HTTPException:
+    """409 while a queue worker holds the conversation, 503 if the lease was lost."""
+    status_code = 409 if isinstance(e, TimeoutError) else 503
+    response.status_code = status_code
+    response.headers["Retry-After"] = str(int(settings.CONVERSATION_LEASE_SECONDS))
+    return HTTPException(status_code=status_code, detail=str(e))
+
+
 @router.post("/accept")
 async def accept(
     request: AcceptRequest,
@@ -53,6 +66,8 @@ async def accept(
         ticket_id = request.ticket_id
         serial_number = request.serial_number
         return await handle_accept(ticket_id, current_user, serial_number=serial_number)
+    except (TimeoutError, LeaseLostError) as e:
+        return conversation_unavailable(e, response)
     except Exception as e:
         if str(e) in ["Serial number already set", "Duplicate Serial Number"]:
             response.status_code = 409
@@ -79,6 +94,8 @@ async def reject(
         ticket_id = request.ticket_id
         reason = request.rejection_reason
         return await handle_accept(ticket_id, current_user, rejection_reason=reason)
+    except (TimeoutError, LeaseLostError) as e:
+        return conversation_unavailable(e, response)
     except Exception as e:
         print(e)
         response.status_code = 500
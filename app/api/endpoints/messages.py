@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException, Response, Depends, Query
-from typing import Annotated
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Literal, Optional
+from datetime import datetime
 
 from app.core.auth import *
 from app.chatbot.messages import get_user_messages
+from app.core.services.exports import stream_messages, EXPORT_MEDIA_TYPES
 
 router = APIRouter()
 
@@ -10,14 +13,39 @@ router = APIRouter()
 @router.get("/history")
 async def fetch_user_messages(
     response: Response,
-    _: Annotated[DashboardUser, Depends(get_current_user)],
-    id: str = Query(..., description="The id of the user")
+    _: Annotated[DashboardUser, Depends(get_token_user)],
+    id: str = Query(..., description="The id of the user"),
+    limit: Optional[int] = Query(
+        None, description="Limit the number of messages returned"),
+    before: Optional[datetime] = Query(
+        None, description="Only messages older than this datetime, for paging"),
 ):
     response.headers["Access-Control-Allow-Origin"] = "*"
     response.headers["Access-Control-Allow-Methods"] = "GET"
-    messages = await get_user_messages(id)
+    messages = await get_user_messages(id, limit, before)
     if not messages:
         raise HTTPException(
             status_code=404, detail="No messages found for this phone number")
 
     return messages
+
+
+@router.get("/export")
+async def export_messages(
+    _: Annotated[DashboardUser, Depends(get_current_user)],
+    format: Literal["ndjson", "csv"] = Query(
+        "ndjson", description="ndjson with full documents or csv with the main columns"),
+    id: Optional[str] = Query(
+        None, description="Only the messages of this user"),
+    date: Optional[datetime] = Query(
+        None, description="Filter messages by date"),
+):
+    try:
+        rows = stream_messages(format, id, date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=messages.{format}"},
+    )
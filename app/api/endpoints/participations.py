@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Response, HTTPException, Query
-from typing import Optional, Annotated
+from fastapi.responses import StreamingResponse
+from typing import Optional, Annotated, Literal
 from pymongo.errors import InvalidDocument
 from datetime import datetime
 
@@ -7,9 +8,10 @@ from datetime import datetime
 from app.core.auth import *
 from app.utils.decorators import check_existence, validate_object_id
 from app.schemas.participation import Participation, ParticipationCreation
-from app.serializers.participation import serialize_participations, serialize_participation
+from app.serializers.participation import serialize_participation, serialize_participation_document, dump_participation_documents
 from app.core.services.participations import *
 from app.core.services.priority_number import count_participations
+from app.core.services.exports import stream_participations, EXPORT_MEDIA_TYPES
 from app.core.services.datetime_mexico import *
 
 router = APIRouter()
@@ -23,12 +25,29 @@ async def get_participation_by_id(id: str):
 
 
 @check_existence
-async def get_participations(limit: int, date: datetime, phone: str, status: str):
+async def get_participations(limit: int, date: datetime, phone: str, status: str, cursor: str, fields: str, response: Response):
+    projection = [field.strip() for field in fields.split(",")] if fields else None
     try:
-        participations = await fetch_participations(limit, date, phone, status)
+        participations, next_cursor = await fetch_participations_page(
+            limit, date, phone, status, cursor, projection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
-    return serialize_participations(participations)
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    response.headers.update(headers)
+
+    if projection:
+        return [serialize_participation_document(participation) for participation in participations]
+    if not participations:
+        return participations
+
+    return Response(
+        content=dump_participation_documents(participations),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @check_existence
@@ -40,7 +59,8 @@ async def get_participation_by_phone(phone: str):
 @router.get("/")
 @check_existence
 async def fetch_all_participations(
-    _: Annotated[DashboardUser, Depends(get_current_user)],
+    response: Response,
+    _: Annotated[DashboardUser, Depends(get_token_user)],
     limit: Optional[int] = Query(
         None, description="Limit the number of participations returned"),
     date: Optional[datetime] = Query(
@@ -49,23 +69,46 @@ async def fetch_all_participations(
         None, description="Filter participations by phone number"),
     status: Optional[str] = Query(
         None, description="Filter participations by status"),
+    cursor: Optional[str] = Query(
+        None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(
+        None, description="Comma separated fields to return, e.g. status,prize,user.phone"),
     response_model=Participation
 ):
-    return await get_participations(limit, date, phone, status)
+    return await get_participations(limit, date, phone, status, cursor, fields, response)
 
 
 @router.get("/count")
 async def api_count_participations(
     date: Optional[datetime] = Query(
-        get_current_datetime(), description="Filter participations by date"),
+        None, description="Filter participations by date, today by default"),
 ):
     count = await count_participations(date)
     return {
-        "datetime": date,
+        "datetime": date or get_current_datetime(),
         "count": count
     }
 
 
+@router.get("/export")
+async def export_participations(
+    _: Annotated[DashboardUser, Depends(get_current_user)],
+    format: Literal["ndjson", "csv"] = Query(
+        "ndjson", description="ndjson with full documents or csv with the main columns"),
+    date: Optional[datetime] = Query(
+        None, description="Filter participations by date"),
+    phone: Optional[str] = Query(
+        None, description="Filter participations by phone number"),
+    status: Optional[str] = Query(
+        None, description="Filter participations by status"),
+):
+    return StreamingResponse(
+        stream_participations(format, date, phone, status),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=participations.{format}"},
+    )
+
+
 @router.get("/{id}")
 async def api_fetch_participation_by_id(id: str, response_model=Participation):
     return await get_participation_by_id(id)
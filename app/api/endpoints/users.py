@@ -5,7 +5,7 @@ from app.schemas.user import User, UserCreation
 from app.api.deps import get_db
 from app.utils.decorators import check_existence
 from app.core.services.users import *
-from app.serializers.user import serialize_user, serialize_users
+from app.serializers.user import serialize_user, serialize_users, dump_user_documents
 
 router = APIRouter()
 
@@ -18,8 +18,10 @@ async def get_user_by_phone(phone: str):
 
 @check_existence
 async def get_users():
-    users = await fetch_users()
-    return serialize_users(users)
+    users = await fetch_user_documents()
+    if not users:
+        return users
+    return Response(content=dump_user_documents(users), media_type="application/json")
 
 
 @router.get("/")
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+
+from app.chatbot.messages import backfill_message
+from app.db.db import MessagesCollection
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+batch_size = 100
+
+
+async def backfill() -> int:
+    """Stores the Twilio body of every message saved without one, old
+    messages and sent content templates alike."""
+    total = 0
+    while True:
+        cursor = MessagesCollection().find(
+            {"text": {"$exists": False}}).limit(batch_size)
+        messages = [message async for message in cursor]
+        if not messages:
+            return total
+
+        results = await asyncio.gather(
+            *[backfill_message(message) for message in messages],
+            return_exceptions=True,
+        )
+        failed = [r for r in results if isinstance(r, Exception)]
+        total += len(messages) - len(failed)
+        logger.info(f"Backfilled {total} messages")
+        if len(failed) == len(messages):
+            raise RuntimeError(f"Backfill stopped: {failed[0]}")
+
+
+async def main() -> None:
+    logger.info("Backfilling message bodies")
+    total = await backfill()
+    logger.info(f"Backfilled {total} messages")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
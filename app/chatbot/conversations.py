@@ -0,0 +1,138 @@
+import asyncio
+import os
+import socket
+from contextlib import asynccontextmanager
+from typing import Dict
+from uuid import uuid4
+
+from app.core.config import settings
+from app.core.services.leases import acquire_lease, renew_lease, release_lease
+
+
+class LeaseLostError(RuntimeError):
+    pass
+
+
+class ConversationExecutor:
+    """
+    Serializes the flow per phone number while letting different phones run in
+    parallel. Inside the process an asyncio.Lock per phone keeps arrival order,
+    across uvicorn workers a lease document in Mongo keeps a single owner.
+    """
+
+    def __init__(self, lease_seconds: float, retry_seconds: float, wait_seconds: float):
+        self.lease_seconds = lease_seconds
+        self.retry_seconds = retry_seconds
+        self.wait_seconds = wait_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+        self._heartbeats: Dict[str, asyncio.Task] = {}
+        # Holders cancelled because their heartbeat lost the lease
+        self._lost: Dict[str, asyncio.Task] = {}
+
+    def _lock(self, phone: str) -> asyncio.Lock:
+        self._users[phone] = self._users.get(phone, 0) + 1
+        return self._locks.setdefault(phone, asyncio.Lock())
+
+    def _unlock(self, phone: str):
+        self._users[phone] -= 1
+        if not self._users[phone]:
+            del self._users[phone]
+            self._locks.pop(phone, None)
+
+    async def _heartbeat(self, phone: str, holder: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not await renew_lease(phone, self.owner, self.lease_seconds):
+                # Someone else may own the conversation now, stop writing to it
+                self._lost[phone] = holder
+                holder.cancel()
+                return
+
+    def _start_heartbeat(self, phone: str):
+        self._heartbeats[phone] = asyncio.create_task(
+            self._heartbeat(phone, asyncio.current_task()))
+
+    @asynccontextmanager
+    async def guard(self, phone: str):
+        """
+        Raises LeaseLostError out of the block when the heartbeat of the
+        lease held for phone fails to renew it.
+        """
+        try:
+            yield
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if self._lost.get(phone) is not task:
+                raise
+            del self._lost[phone]
+            # Python 3.10 tasks have no cancellation count to undo
+            if hasattr(task, "uncancel"):
+                task.uncancel()
+            raise LeaseLostError(f"Lost conversation lease for {phone}")
+
+    async def _acquire_lease(self, phone: str):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_seconds
+        while not await acquire_lease(phone, self.owner, self.lease_seconds):
+            if loop.time() >= deadline:
+                raise TimeoutError(f"Conversation {phone} is busy")
+            await asyncio.sleep(self.retry_seconds)
+        self._start_heartbeat(phone)
+
+    async def _release_lease(self, phone: str):
+        heartbeat = self._heartbeats.pop(phone, None)
+        if heartbeat:
+            heartbeat.cancel()
+        await release_lease(phone, self.owner)
+
+    @asynccontextmanager
+    async def conversation(self, phone: str):
+        """Waits until the conversation for phone is free and holds it."""
+        lock = self._lock(phone)
+        try:
+            async with lock:
+                await self._acquire_lease(phone)
+                try:
+                    async with self.guard(phone):
+                        yield
+                finally:
+                    await self._release_lease(phone)
+        finally:
+            self._unlock(phone)
+
+    async def try_acquire(self, phone: str) -> bool:
+        """
+        Takes the conversation only if nobody else holds it right now. The
+        caller should work on it inside guard(phone) until release(phone).
+        """
+        if phone in self._locks and self._locks[phone].locked():
+            return False
+        lock = self._lock(phone)
+        await lock.acquire()
+        try:
+            if await acquire_lease(phone, self.owner, self.lease_seconds):
+                self._start_heartbeat(phone)
+                return True
+        except Exception:
+            lock.release()
+            self._unlock(phone)
+            raise
+        lock.release()
+        self._unlock(phone)
+        return False
+
+    async def release(self, phone: str):
+        try:
+            await self._release_lease(phone)
+        finally:
+            self._locks[phone].release()
+            self._unlock(phone)
+
+
+conversation_executor = ConversationExecutor(
+    settings.CONVERSATION_LEASE_SECONDS,
+    settings.CONVERSATION_LEASE_RETRY_SECONDS,
+    settings.CONVERSATION_LEASE_WAIT_SECONDS,
+)
@@ -1,7 +1,14 @@
-from fastapi import APIRouter, Request, HTTPException, Response
+from fastapi import APIRouter, Request, HTTPException, Response, Depends
+from typing import Annotated
 
+from app.core.auth import DashboardUser, get_token_user
+from app.core.config import settings
+from app.core.services.inbound_queue import enqueue_message
+from app.core.services.idempotency import claim_message_sid, store_response, release_message_sid
 from app.chatbot.messages import *
 from app.chatbot.user_flow import handle_flow
+from app.chatbot.workers import worker_pool
+from app.chatbot.conversations import conversation_executor
 
 
 router = APIRouter()
@@ -15,9 +22,24 @@ async def webhook(request: Request, response: Response):
         if not (message.body_content or message.num_media) or not message.from_number:
             raise AttributeError
 
-        await handle_flow(message)
-
-        return {"message": "Received", "from": message.from_number}
+        cached_response = await claim_message_sid(message.sms_message_sid)
+        if cached_response is not None:
+            return cached_response
+
+        try:
+            if settings.WEBHOOK_QUEUE_ENABLED:
+                await enqueue_message(message)
+                worker_pool.notify()
+            else:
+                async with conversation_executor.conversation(message.from_number):
+                    await handle_flow(message)
+        except Exception:
+            await release_message_sid(message.sms_message_sid)
+            raise
+
+        result = {"message": "Received", "from": message.from_number}
+        await store_response(message.sms_message_sid, result)
+        return result
 
     except AttributeError:
         error_message = "Invalid message format. Please ensure the message is correctly formatted."
@@ -32,3 +54,10 @@ async def webhook(request: Request, response: Response):
         response.status_code = 500
         print(f'Exception: {exc}')
         return {"error": "An unexpected error occurred. Please try again later."}
+
+
+@router.get("/queue")
+async def inbound_queue_stats(
+    _: Annotated[DashboardUser, Depends(get_token_user)],
+):
+    return await worker_pool.stats()
@@ -3,6 +3,7 @@ from app.schemas.user import User
 from app.schemas.participation import Participation, Status
 from app.schemas.prize import Code
 from app.chatbot.transitions import *
+from app.chatbot.graph import FlowGraph
 from app.core.services.priority_number import set_priority_number
 
 
@@ -113,3 +114,5 @@ FLOW = {
         message_template='HX4fa1b484f4549d844bb2489db9bf21d8',
     ),
 }
+
+FLOW_GRAPH = FlowGraph(FLOW)
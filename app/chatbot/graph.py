@@ -0,0 +1,107 @@
+from collections import deque
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.chatbot.steps import Steps
+from app.chatbot.transitions import (
+    Transition,
+    ResponseDependentTransition,
+    ResponseIndependentTransition,
+    MultimediaUploadTransition,
+    DashboardTransition,
+    ServerTransition,
+)
+
+
+# Steps a conversation can start from without a transition leading to them
+ENTRY_STEPS = (Steps.ONBOARDING, Steps.NEW_PARTICIPATION,
+               Steps.MAX_PARTICIPATIONS)
+
+
+class Kind(Enum):
+    MESSAGE = 'message'
+    MULTIMEDIA = 'multimedia'
+    DASHBOARD = 'dashboard'
+    SERVER = 'server'
+
+
+def _kind(transition: Transition) -> Kind:
+    if isinstance(transition, MultimediaUploadTransition):
+        return Kind.MULTIMEDIA
+    if isinstance(transition, (ResponseDependentTransition, ResponseIndependentTransition)):
+        return Kind.MESSAGE
+    if isinstance(transition, DashboardTransition):
+        return Kind.DASHBOARD
+    if isinstance(transition, ServerTransition):
+        return Kind.SERVER
+    raise ValueError(f"Unknown transition {type(transition).__name__}")
+
+
+def _targets(transition: Transition) -> Tuple[Steps, ...]:
+    if isinstance(transition, MultimediaUploadTransition):
+        targets = [transition.success_step, transition.failure_step]
+    elif isinstance(transition, ResponseIndependentTransition):
+        targets = [transition.next_step]
+    else:
+        targets = list((transition.transitions or {}).values())
+    return tuple(dict.fromkeys(targets))
+
+
+class State:
+    def __init__(self, step: Steps, transition: Transition):
+        self.step = step
+        self.transition = transition
+        self.kind = _kind(transition)
+        self.targets = _targets(transition)
+        self.format_plan = transition.format_args.plan if transition.format_args else []
+
+
+class FlowGraph:
+    """
+    The flow compiled once at import: every step resolved to its state, kind
+    and targets, checked for transitions to missing steps and for steps no
+    entry can reach.
+    """
+
+    def __init__(self, flow: Dict[Steps, Transition], entries: Iterable[Steps] = ENTRY_STEPS):
+        self.flow = flow
+        self.states: Dict[object, State] = {}
+        for step, transition in flow.items():
+            state = State(step, transition)
+            # Participations store the step value, lookups take either
+            self.states[step] = state
+            self.states[step.value] = state
+        self.validate(entries)
+
+    def get(self, step, default: Optional[State] = None) -> Optional[State]:
+        return self.states.get(step, default)
+
+    def state(self, step) -> State:
+        state = self.states.get(step)
+        if not state:
+            raise ValueError("Invalid step")
+        return state
+
+    def validate(self, entries: Iterable[Steps]):
+        errors: List[str] = []
+        for step, transition in self.flow.items():
+            for target in _targets(transition):
+                if target not in self.flow:
+                    errors.append(
+                        f"{step.value} leads to missing step {getattr(target, 'value', target)}")
+
+        reachable = set()
+        pending = deque(step for step in entries if step in self.flow)
+        while pending:
+            step = pending.popleft()
+            if step in reachable:
+                continue
+            reachable.add(step)
+            pending.extend(target for target in self.states[step].targets
+                           if target in self.flow)
+        for step in self.flow:
+            if step not in reachable:
+                errors.append(f"{step.value} is unreachable")
+
+        if errors:
+            raise ValueError(f"Invalid flow: {'; '.join(errors)}")
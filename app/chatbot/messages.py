@@ -1,24 +1,75 @@
+import asyncio
 import urllib.parse
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from twilio.rest import Client
 from bson import ObjectId
 from pydantic import BaseModel, HttpUrl, Field
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Dict
 from datetime import datetime
 
 
 from app.schemas.user import User
 from app.core.config import settings
-from app.core.services.messages import save_message
+from app.core.services.messages import save_message, fetch_messages, save_message_body
 from app.db.db import MessagesCollection
-from app.core.services.datetime_mexico import UTC_to_local
+from app.core.services.datetime_mexico import UTC_to_local, local_to_UTC
+
+try:
+    from twilio.http.async_http_client import AsyncTwilioHttpClient
+except ImportError:
+    AsyncTwilioHttpClient = None
 
 client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+_backfill_semaphore = asyncio.Semaphore(8)
+twilio_executor = ThreadPoolExecutor(
+    max_workers=settings.TWILIO_THREAD_POOL_SIZE, thread_name_prefix="twilio")
+
+
+class _AsyncTwilioClientSingleton:
+    """
+    Twilio client backed by a pooled aiohttp session. The session binds to the
+    running event loop, so it is created on first use instead of at import.
+    """
+    client: Client | None = None
+    http_client = None
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(_AsyncTwilioClientSingleton, cls).__new__(cls)
+            cls.instance.http_client = AsyncTwilioHttpClient(
+                timeout=settings.TWILIO_HTTP_TIMEOUT)
+            cls.instance.client = Client(
+                settings.TWILIO_ACCOUNT_SID,
+                settings.TWILIO_AUTH_TOKEN,
+                http_client=cls.instance.http_client,
+            )
+        return cls.instance
+
+
+def get_async_client() -> Client | None:
+    if AsyncTwilioHttpClient is None:
+        return None
+    return _AsyncTwilioClientSingleton().client
+
+
+async def close_twilio_client():
+    if hasattr(_AsyncTwilioClientSingleton, 'instance'):
+        await _AsyncTwilioClientSingleton.instance.http_client.close()
+        del _AsyncTwilioClientSingleton.instance
+
+
+async def run_in_twilio_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(twilio_executor, partial(func, *args, **kwargs))
 
 
 class Message:
     def __init__(self, body):
         body_str = body.decode()
+        # Raw form body, kept so the message can be queued and parsed again
+        self.raw_body = body_str
         parsed_body = urllib.parse.parse_qs(body_str)
 
         # Unique ID of the message
@@ -44,28 +95,54 @@ class Message:
             ]
 
 
+async def create_message(**params):
+    async_client = get_async_client()
+    if async_client:
+        return await async_client.messages.create_async(**params)
+    return await run_in_twilio_executor(client.messages.create, **params)
+
+
 async def send_message(body: str, user: User, format_args: dict = {}):
     try:
-        message = client.messages.create(
-            messaging_service_sid=settings.TWILIO_MESSAGING_SERVICE_SID,
-            content_sid=body,
-            content_variables=json.dumps(format_args) if format_args else None,
-            to=user.phone
-        )
-        await save_message(message.sid, user)
+        params = {
+            "messaging_service_sid": settings.TWILIO_MESSAGING_SERVICE_SID,
+            "content_sid": body,
+            "to": user.phone,
+        }
+        if format_args:
+            params["content_variables"] = json.dumps(format_args)
+        message = await create_message(**params)
+        # Content templates come back without a body until Twilio renders them
+        await save_message(message.sid, user, text=message.body or None,
+                           body_pending=not message.body)
     except Exception as e:
         print(f"Error: {e}")
         raise RuntimeError("Failed to send message")
 
 
+async def fetch_message(message_sid: str):
+    async_client = get_async_client()
+    if async_client:
+        message = await async_client.messages(message_sid).fetch_async()
+        media = []
+        if int(message.num_media) > 0:
+            media = await async_client.messages(message_sid).media.list_async()
+        return message, media
+
+    message = await run_in_twilio_executor(client.messages(message_sid).fetch)
+    media = []
+    if int(message.num_media) > 0:
+        media = await run_in_twilio_executor(client.messages(message_sid).media.list)
+    return message, media
+
+
 async def retrieve_body(message_sid: str) -> Tuple[str, str]:
     try:
-        message = client.messages(message_sid).fetch()
+        message, media = await fetch_message(message_sid)
         body = message.body or None
         url = None
-        if int(message.num_media) > 0:
-            uris = [media.uri for media in message.media.list()]
-            uri = uris[0]
+        if media:
+            uri = media[0].uri
             base_url = "https://api.twilio.com"
             url = f"{base_url}{uri.replace('.json', '')}"
 
@@ -76,29 +153,45 @@ async def retrieve_body(message_sid: str) -> Tuple[str, str]:
         raise RuntimeError("Failed to retrieve message")
 
 
-async def get_user_messages(user_id: str):
-    if not ObjectId.is_valid(user_id):
-        raise ValueError("Invalid ID")
+async def backfill_message(message: Dict):
+    """Fills in the body of a message saved without one, from Twilio."""
+    async with _backfill_semaphore:
+        text, photo_url = await retrieve_body(message["message_sid"])
+    await save_message_body(message["_id"], text, photo_url)
+    message["text"] = text
+    message["photo_url"] = photo_url
 
-    cursor = MessagesCollection().find({"client_id": ObjectId(user_id)})
-    messages = []
-    async for message in cursor:
-        message["_id"] = str(message["_id"])
-        message["client_id"] = str(message["client_id"])
 
-        text, photo_url = await retrieve_body(message["message_sid"])
+async def get_user_messages(user_id: str, limit: Optional[int] = None, before: Optional[datetime] = None):
+    if not ObjectId.is_valid(user_id):
+        raise ValueError("Invalid ID")
 
-        local_datetime = UTC_to_local(message['datetime'])
+    # Datetimes are returned in local time, so naive ones come back that way
+    if before and before.tzinfo is None:
+        before = local_to_UTC(before)
+    messages = await fetch_messages(user_id, limit, before)
+
+    # Only old messages and sent templates are saved without a body. The newest
+    # few are fetched now, the rest are left for app.backfill_messages
+    missing = [message for message in messages if "text" not in message]
+    missing = missing[:settings.MESSAGE_HISTORY_BACKFILL_LIMIT]
+    if missing:
+        results = await asyncio.gather(
+            *[backfill_message(message) for message in missing],
+            return_exceptions=True,
+        )
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            print(f"Failed to backfill {len(failed)} messages: {failed[0]}")
 
-        messages.append({
+    return [
+        {
             "message_sid": message["message_sid"],
             "from_": message["from"],
             "to": message["to"],
-            "datetime": local_datetime,
-            "text": text,
-            "photo_url": photo_url
-        })
-
-    messages.sort(key=lambda x: x["datetime"], reverse=True)
-
-    return messages
+            "datetime": UTC_to_local(message["datetime"]),
+            "text": message.get("text"),
+            "photo_url": message.get("photo_url"),
+        }
+        for message in messages
+    ]
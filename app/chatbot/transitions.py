@@ -1,4 +1,3 @@
-import requests
 import re
 from abc import ABC, abstractmethod
 from typing import Optional, Dict, List, Tuple
@@ -10,11 +9,26 @@ from app.schemas.user import User
 from app.schemas.participation import Participation, Status
 from app.core.services.users import update_user_by_phone
 from app.core.services.participations import update_participation, add_participation
-from app.core.services.tickets import upload_to_gcp
+from app.core.services.media import stream_media_to_gcp
+from app.core.services.unit_of_work import UnitOfWork
 from app.chatbot.messages import Message
 from app.chatbot.steps import Steps
 
 
+_NON_ASCII = re.compile(r'[^\x00-\x7F]+')
+
+_ANSWERS = {
+    'si acepto': True,
+    'confirmar': True,
+    'no acepto': False,
+    'editar': False,
+}
+
+
+def normalize_response(text: str) -> str:
+    return _NON_ASCII.sub('', text).lower().strip()
+
+
 class ClassMapping:
     def __init__(self, cls: List[Tuple[object, str]]):
         self.map = defaultdict(list)
@@ -23,6 +37,11 @@ class ClassMapping:
                 self.map[obj].append(name)
             else:
                 self.map["other"].append(name)
+        # Template variable, source and param, in the order they are numbered
+        self.plan = []
+        for obj, params in self.map.items():
+            for param in params:
+                self.plan.append((str(len(self.plan) + 1), obj, param))
 
     def get(self, obj):
         return self.map[obj]
@@ -44,19 +63,24 @@ class Transition(ABC):
     def get_template(self) -> str:
         return self.message_template
 
-    async def save_upload_params(self, user: User, participation: Participation, content: str):
+    async def save_upload_params(self, user: User, participation: Participation, content: str, unit_of_work: Optional[UnitOfWork] = None):
         user_phone = user.phone
         for obj, params in self.upload_params.map.items():
             if obj == User and content:
                 for param in params:
                     setattr(user, param, content)
+                    if unit_of_work:
+                        return unit_of_work.register_user(user)
                     user = await update_user_by_phone(user_phone, user)
                     return user
             elif obj == Participation and content:
                 for param in params:
                     # import Participation
                     setattr(participation, param, content)
-                    await update_participation(participation.id, participation)
+                    if unit_of_work:
+                        unit_of_work.register_participation(participation)
+                    else:
+                        await update_participation(participation.id, participation)
             else:
                 for param in params:
                     print(f"Should Save param: {param}")
@@ -70,17 +94,15 @@ class WhatsAppTransition(Transition):
 class ResponseDependentTransition(WhatsAppTransition):
     def __init__(self, transitions: Dict[str, str], message_template: str, format_args: Optional[ClassMapping] = None, upload_params: Optional[ClassMapping] = None):
         super().__init__(message_template, format_args, upload_params)
-        self.transitions = transitions
+        self.transitions = {normalize_response(response): step
+                            for response, step in transitions.items()}
 
     def execute(self, participation: Participation, message: Message):
-        user_response = re.sub(r'[^\x00-\x7F]+', '',
-                               message.body_content).lower().strip()
+        user_response = normalize_response(message.body_content)
 
         next_step = self.transitions.get(user_response, participation.flow)
-        if user_response == "si acepto" or user_response == "confirmar":
-            message.body_content = True
-        elif user_response == "no acepto" or user_response == "editar":
-            message.body_content = False
+        if user_response in _ANSWERS:
+            message.body_content = _ANSWERS[user_response]
 
         if next_step == participation.flow:
             message.body_content = None
@@ -102,22 +124,12 @@ class MultimediaUploadTransition(WhatsAppTransition):
         self.success_step = success_step
         self.failure_step = failure_step
 
-    def execute(self, participation: Participation, message: Message):
+    async def execute(self, participation: Participation, message: Message):
         if message.num_media > 0:
             try:
                 media_url = message.media_urls[0]
-                r = requests.get(media_url)
-                content_type = r.headers['Content-Type']
-                # remove the whatsapp: prefix from the number
-                if content_type == 'image/jpeg':
-                    filename = f'{participation.user.id}/{participation.id}.jpg'
-                elif content_type == 'image/png':
-                    filename = f'{participation.user.id}/{participation.id}.png'
-                else:
-                    raise Exception("Invalid file type")
-
-                if not upload_to_gcp(r.content, filename):
-                    raise Exception("Failed to upload image")
+                destination = f'{participation.user.id}/{participation.id}'
+                filename = await stream_media_to_gcp(media_url, destination)
 
                 message.body_content = filename
                 return self.success_step
@@ -132,10 +144,13 @@ class DashboardTransition(Transition):
         self.transitions = transitions
         self.status = status
 
-    async def execute(self, participation: Participation, response: str):
+    async def execute(self, participation: Participation, response: str, unit_of_work: Optional[UnitOfWork] = None):
         if self.status:
             participation.status = self.status
-            await update_participation(participation.id, participation)
+            if unit_of_work:
+                unit_of_work.register_participation(participation)
+            else:
+                await update_participation(participation.id, participation)
         if not self.transitions:
             return
         return self.transitions.get(response, participation.status)
@@ -148,12 +163,18 @@ class ServerTransition(Transition):
         self.action = action
         self.status = status
 
-    async def execute(self, participation: Participation):
+    async def execute(self, participation: Participation, unit_of_work: Optional[UnitOfWork] = None):
         if self.status:
             if self.status == Status.PENDING.value:
-                await add_participation(participation)
+                await add_participation(participation, unit_of_work)
             participation.status = self.status
-            await update_participation(participation.id, participation)
+            if unit_of_work:
+                unit_of_work.register_participation(participation)
+            else:
+                await update_participation(participation.id, participation)
         if not self.transitions:
             return None
+        if unit_of_work:
+            # The action works on the stored participation
+            await unit_of_work.commit()
         return self.transitions.get(await self.action(participation), participation.flow)
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Dict, Optional
 from datetime import datetime
 
@@ -7,12 +8,14 @@ from app.schemas.prize import Code
 from app.chatbot.messages import Message, send_message
 from app.chatbot.steps import Steps
 from app.core.services.users import create_user, fetch_user_by_phone, can_participate
-from app.core.services.participations import ParticipationCreation, create_participation, fetch_participations, update_participation, upload_attempt
-from app.core.services.priority_number import count_participations
+from app.core.services.participations import ParticipationCreation, create_participation, fetch_participations, upload_attempt
+from app.core.services.priority_number import participations_counter
 from app.core.services.codes import get_code_by_participation
 from app.core.services.messages import save_message
-from app.chatbot.transitions import Transition, WhatsAppTransition, DashboardTransition, ServerTransition, MultimediaUploadTransition
-from app.chatbot.flow import FLOW
+from app.core.services.unit_of_work import UnitOfWork
+from app.chatbot.transitions import Transition, ClassMapping
+from app.chatbot.graph import FlowGraph, Kind
+from app.chatbot.flow import FLOW, FLOW_GRAPH
 
 
 async def get_current_participation(user: User) -> Participation:
@@ -27,7 +30,7 @@ async def get_current_participation(user: User) -> Participation:
 
 
 async def handle_user(user: User, participation: Participation, message: Message):
-    flow_manager = FlowManager(FLOW, user, participation)
+    flow_manager = FlowManager(FLOW_GRAPH, user, participation)
     try:
         await flow_manager.execute(message=message)
     except Exception as e:
@@ -38,7 +41,7 @@ async def handle_user(user: User, participation: Participation, message: Message
 async def handle_new_user(message: Message):
     user_creation = UserCreation(phone=message.from_number)
     user = await create_user(user_creation)
-    count = await count_participations()
+    count = await participations_counter.get()
 
     await send_message(
         FLOW[Steps.ONBOARDING].message_template,
@@ -58,7 +61,13 @@ async def handle_flow(message: Message):
     try:
         user = await fetch_user_by_phone(message.from_number)
 
-        await save_message(message.sms_message_sid, user, from_user=True)
+        await save_message(
+            message.sms_message_sid,
+            user,
+            from_user=True,
+            text=message.body_content,
+            photo_url=message.media_urls[0] if message.media_urls else None,
+        )
 
         if not can_participate(user):
             await handle_max_participations(user)
@@ -74,42 +83,45 @@ async def handle_flow(message: Message):
 
 
 class FlowManager:
-    def __init__(self, flow: Dict[Steps, Transition], user: User, participation: Participation):
+    def __init__(self, flow: FlowGraph, user: User, participation: Participation):
         self.flow = flow
         self.user = user
         self.participation = participation
+        self.unit_of_work = UnitOfWork()
+        self.unit_of_work.register_user(user)
+        self.unit_of_work.register_participation(participation)
 
     async def update_user_flow(self, next_step: str):
         self.participation.flow = next_step.value
-        await update_participation(self.participation.id, self.participation)
+
+    async def resolve_format_args(self, format_args: ClassMapping) -> Dict[str, str]:
+        """Fetches every source the template needs once, concurrently."""
+        sources = {User: self.user, Participation: self.participation}
+        fetches = {}
+        if Code in format_args.map:
+            fetches[Code] = get_code_by_participation(self.participation)
+        if "current_participations" in format_args.map.get("other", []):
+            fetches["current_participations"] = participations_counter.get()
+        if fetches:
+            results = await asyncio.gather(*fetches.values())
+            sources.update(zip(fetches.keys(), results))
+
+        args = {}
+        for key, obj, param in format_args.plan:
+            if obj == "other":
+                if param in sources:
+                    args[key] = str(sources[param])
+            elif obj in sources:
+                args[key] = f"{sources[obj].__getattribute__(param)}"
+            else:
+                args[key] = f"{param}"
+        return args
 
     async def handle_message(self, transition: Transition):
         body = transition.get_template()
         format_args = transition.format_args
         if format_args:
-            count = 1
-            args = {}
-            objects = format_args.available()
-            for obj in objects:
-                for param in format_args.get(obj):
-                    if obj == User:
-                        args[str(count)
-                             ] = f"{self.user.__getattribute__(param)}"
-                    elif obj == Participation:
-                        args[str(
-                            count)] = f"{self.participation.__getattribute__(param)}"
-                    elif obj == Code:
-                        code = await get_code_by_participation(self.participation)
-                        args[str(count)] = f"{code.__getattribute__(param)}"
-                    elif obj == "other":
-                        if param == "current_participations":
-                            ticket_count = await count_participations()
-                            args[str(count)] = str(ticket_count)
-                    else:
-                        args[str(count)] = f"{param}"
-                    count += 1
-
-            format_args = args
+            format_args = await self.resolve_format_args(format_args)
 
         try:
             await send_message(body, self.user, format_args)
@@ -119,45 +131,51 @@ class FlowManager:
     async def handle_upload_params(self,  transition, message: Optional[Message] = None, response: Optional[str] = None):
         if transition.upload_params:
             content = message.body_content if message else response
-            object = await transition.save_upload_params(self.user, self.participation, content)
+            object = await transition.save_upload_params(self.user, self.participation, content, self.unit_of_work)
             if isinstance(object, User):
                 self.user = object
 
     async def execute(self, message: Optional[Message] = None, response: Optional[str] = None):
-        step = Steps(self.participation.flow)
-        transition = self.flow.get(step, None)
-        if not transition:
-            raise ValueError("Invalid step")
+        """Runs the flow for one message or dashboard response and saves every change at the end."""
+        await self._execute(message=message, response=response)
+        await self.unit_of_work.commit()
+
+    async def _execute(self, message: Optional[Message] = None, response: Optional[str] = None):
+        state = self.flow.state(self.participation.flow)
+        transition = state.transition
 
-        next_step = step
-        if isinstance(transition, WhatsAppTransition):
+        next_step = state.step
+        if state.kind == Kind.MULTIMEDIA:
+            if message:
+                next_step = await transition.execute(
+                    participation=self.participation, message=message)
+                print("updload media")
+                await upload_attempt(self.participation)
+                if transition.upload_params:
+                    await self.handle_upload_params(transition=transition, message=message)
+        elif state.kind == Kind.MESSAGE:
             if message:
                 next_step = transition.execute(
                     participation=self.participation, message=message)
-                if isinstance(transition, MultimediaUploadTransition):
-                    print("updload media")
-                    await upload_attempt(self.participation)
                 if transition.upload_params:
                     await self.handle_upload_params(transition=transition, message=message)
-        elif isinstance(transition, DashboardTransition):
+        elif state.kind == Kind.DASHBOARD:
             if response and isinstance(response, str):
                 next_step = await transition.execute(
-                    participation=self.participation, response=response)
+                    participation=self.participation, response=response, unit_of_work=self.unit_of_work)
                 if transition.upload_params:
                     await self.handle_upload_params(transition=transition, response=response)
 
-        transition = self.flow.get(Steps(next_step), transition)
+        state = self.flow.state(next_step)
+        transition = state.transition
 
-        if isinstance(transition, ServerTransition):
+        if state.kind == Kind.SERVER:
             old_step = next_step
-            next_step = await transition.execute(participation=self.participation)
+            next_step = await transition.execute(participation=self.participation, unit_of_work=self.unit_of_work)
             await self.update_user_flow(next_step or old_step)
             await self.handle_message(transition)
             if next_step:
-                await self.execute(response=next_step)
-        elif isinstance(transition, DashboardTransition):
-            await self.handle_message(transition)
-            await self.update_user_flow(next_step)
+                await self._execute(response=next_step)
         else:
             await self.handle_message(transition)
             await self.update_user_flow(next_step)
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List
+
+from app.chatbot.messages import Message
+from app.chatbot.user_flow import handle_flow
+from app.chatbot.conversations import conversation_executor, LeaseLostError
+from app.core.config import settings
+from app.core.services.inbound_queue import next_conversation, claim_message, complete_message, fail_message, queue_stats
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.monotonic()
+
+    def to_dict(self) -> Dict:
+        uptime = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "name": self.name,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "throughput_per_second": round(self.processed / uptime, 3),
+            "utilization": round(self.busy_seconds / uptime, 3),
+        }
+
+
+class InboundWorkerPool:
+    """
+    Drains the inbound messages queue with a fixed number of asyncio workers.
+    The webhook only persists the message and calls notify(), so Twilio gets
+    its response before any of the flow work runs. A worker owns a whole
+    conversation while it drains it, so messages of one phone keep their order.
+    """
+
+    def __init__(self, size: int, poll_seconds: float):
+        self.size = size
+        self.poll_seconds = poll_seconds
+        self.workers: List[WorkerStats] = []
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping.clear()
+        prefix = f"{os.getpid()}"
+        for i in range(self.size):
+            stats = WorkerStats(f"{prefix}-{i}")
+            self.workers.append(stats)
+            self._tasks.append(asyncio.create_task(self._run(stats)))
+
+    async def stop(self, timeout: float = 10):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        self._tasks = []
+        self.workers = []
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _run(self, stats: WorkerStats):
+        busy = []
+        while not self._stopping.is_set():
+            try:
+                phone = await next_conversation(busy)
+            except Exception as e:
+                logger.error(f"Failed to look up inbound messages: {e}")
+                phone = None
+
+            if not phone:
+                busy = []
+                await self._wait_for_work()
+                continue
+
+            try:
+                acquired = await conversation_executor.try_acquire(phone)
+            except Exception as e:
+                logger.error(f"Failed to take conversation {phone}: {e}")
+                await self._wait_for_work()
+                continue
+            if not acquired:
+                # Another worker owns this conversation, look for a different one
+                busy.append(phone)
+                continue
+
+            busy = []
+            try:
+                async with conversation_executor.guard(phone):
+                    if not await self._drain(phone, stats):
+                        # Its oldest message is waiting for a retry
+                        busy.append(phone)
+            except LeaseLostError as e:
+                # The unfinished message stays claimed and is retried once it expires
+                logger.error(str(e))
+            finally:
+                try:
+                    await conversation_executor.release(phone)
+                except Exception as e:
+                    # The lease expires on its own, the local lock is already free
+                    logger.error(f"Failed to release conversation {phone}: {e}")
+
+    async def _drain(self, phone: str, stats: WorkerStats) -> int:
+        """
+        Processes the queued messages of one conversation in arrival order and
+        returns how many it took.
+        """
+        taken = 0
+        while not self._stopping.is_set():
+            try:
+                job = await claim_message(stats.name, phone)
+            except Exception as e:
+                logger.error(f"Failed to claim inbound message: {e}")
+                return taken
+            if not job:
+                return taken
+            taken += 1
+            await self._process(job, stats)
+        return taken
+
+    async def _process(self, job: Dict, stats: WorkerStats):
+        start = time.monotonic()
+        try:
+            message = Message(job["body"].encode())
+            await handle_flow(message)
+            await complete_message(job)
+            stats.processed += 1
+        except Exception as e:
+            logger.error(f"Failed to process inbound message {job['_id']}: {e}")
+            stats.failed += 1
+            try:
+                await fail_message(job, e)
+            except Exception as e:
+                logger.error(f"Failed to requeue inbound message {job['_id']}: {e}")
+        finally:
+            stats.busy_seconds += time.monotonic() - start
+
+    async def stats(self) -> Dict:
+        stats = await queue_stats()
+        stats["workers"] = [worker.to_dict() for worker in self.workers]
+        return stats
+
+
+worker_pool = InboundWorkerPool(
+    settings.INBOUND_QUEUE_WORKERS, settings.INBOUND_QUEUE_POLL_SECONDS)
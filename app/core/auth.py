@@ -1,9 +1,13 @@
+import asyncio
 import jwt
+from time import monotonic
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
-from typing import Annotated
+from typing import Annotated, Optional, Tuple
 from jwt.exceptions import InvalidTokenError
 
 from app.core.config import settings
@@ -13,6 +17,16 @@ from app.core.services.datetime_mexico import *
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
+# Dashboard users by username, so authenticated requests skip the lookup
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_SECONDS)
+
+
+# bcrypt releases the GIL, hashing in these threads keeps the event loop free
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+# Hashes running or waiting for a thread, bounded so bursts are turned away
+_password_pending = 0
 
 
 def verify_password(plain_password, hashed_password):
@@ -23,26 +37,105 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+async def run_in_password_executor(func, *args):
+    global _password_pending
+    if _password_pending >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    _password_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_executor, func, *args)
+    finally:
+        _password_pending -= 1
+
+
+class LoginThrottle:
+    """
+    Limits the logins per username and client within a sliding window, so
+    guessing a password can't keep the bcrypt threads busy. Attempts count
+    when they start, until a successful login resets them, so concurrent
+    guesses are limited too. Keying on the client keeps one client from
+    locking everyone else out of an account.
+    """
+
+    def __init__(self, max_attempts: int, window_seconds: float, maxsize: int = 10000):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self._attempts = TTLCache(maxsize=maxsize, ttl=window_seconds)
+
+    def _recent(self, key: Tuple[str, Optional[str]]):
+        now = monotonic()
+        attempts = [at for at in self._attempts.get(key, [])
+                    if now - at < self.window_seconds]
+        return now, attempts
+
+    def attempt(self, username: str, client: Optional[str] = None) -> float:
+        """
+        Records an attempt and returns 0, or the seconds until username may
+        try again from client without recording anything.
+        """
+        key = (username, client)
+        now, attempts = self._recent(key)
+        if len(attempts) >= self.max_attempts:
+            return self.window_seconds - (now - attempts[-self.max_attempts])
+        attempts.append(now)
+        self._attempts[key] = attempts
+        return 0
+
+    def reset(self, username: str, client: Optional[str] = None):
+        self._attempts.pop((username, client), None)
+
+
+login_throttle = LoginThrottle(
+    settings.LOGIN_MAX_ATTEMPTS, settings.LOGIN_WINDOW_SECONDS)
+
+
 async def get_user(username: str):
     user = await DashboardUsersCollection().find_one({"username": username})
     return DashboardUserInDB(**user) if user else None
 
 
+async def get_principal(username: str):
+    user = principal_cache.get(username)
+    if user is None:
+        user = await get_user(username)
+        if user:
+            principal_cache[username] = user
+    return user
+
+
+def invalidate_principal(username: str):
+    principal_cache.pop(username, None)
+
+
 async def create_user(user: DashboardUserCreate):
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_in_password_executor(get_password_hash, user.password)
     user_dict = user.model_dump()
     user_dict["hashed_password"] = hashed_password
     del user_dict["password"]
     await DashboardUsersCollection().insert_one(user_dict)
+    invalidate_principal(user.username)
     return DashboardUser(**user_dict)
 
 
-async def authenticate_user(username: str, password: str):
+async def authenticate_user(username: str, password: str, client: Optional[str] = None):
+    retry_after = login_throttle.attempt(username, client)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
     user = await get_user(username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await run_in_password_executor(verify_password, password, user.hashed_password):
         return False
+    login_throttle.reset(username, client)
     return user
 
 
@@ -58,28 +151,44 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def decode_token(token: str) -> TokenData:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY,
                              algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
         role: str = payload.get("role")
         if username is None or role is None:
-            raise credentials_exception
-        token_data = TokenData(username=username, role=role)
+            raise credentials_exception()
+        return TokenData(username=username, role=role)
     except InvalidTokenError:
-        raise credentials_exception
-    user = await get_user(username=token_data.username)
+        raise credentials_exception()
+
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+    token_data = decode_token(token)
+    user = await get_principal(username=token_data.username)
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
 
 
+async def get_token_user(token: Annotated[str, Depends(oauth2_scheme)]):
+    """
+    Trusts the signed token without looking the user up, for read-only
+    endpoints. A deleted user keeps access to them until the token expires.
+    """
+    token_data = decode_token(token)
+    return DashboardUser(username=token_data.username, role=token_data.role)
+
+
 class RoleChecker:
     def __init__(self, allowed_roles):
         self.allowed_roles = allowed_roles
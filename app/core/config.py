@@ -1,7 +1,7 @@
 from pathlib import Path
 from pydantic import AnyHttpUrl, BeforeValidator
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Annotated, Any
+from typing import Annotated, Any, Literal
 from zoneinfo import ZoneInfo
 
 
@@ -36,15 +36,68 @@ class Settings(BaseSettings):
     TWILIO_ACCOUNT_SID: str
     TWILIO_AUTH_TOKEN: str
     TWILIO_MESSAGING_SERVICE_SID: str
+    TWILIO_HTTP_TIMEOUT: float = 10
+    TWILIO_THREAD_POOL_SIZE: int = 16
+    # Bodies fetched from Twilio per history request, newest first
+    MESSAGE_HISTORY_BACKFILL_LIMIT: int = 20
     GCP_BUCKET_CREDENTIALS_ADDRESS: str = "gcp_bucket_credentials.json"
     TICKET_BUCKET_NAME: str
+    GCS_API_URL: str = "https://storage.googleapis.com"
+    MEDIA_MAX_CONCURRENCY: int = 8
+    MEDIA_TIMEOUT_SECONDS: float = 60
+    MEDIA_CONNECT_TIMEOUT_SECONDS: float = 10
+    # Must be a multiple of 256 KiB for GCS resumable uploads
+    MEDIA_CHUNK_SIZE: int = 1024 * 1024
     INVALID_PHOTO_MAX_OPPORTUNITIES: int = 3
     DAILY_PARTICIPAITONS: int = 5
+    # Priority numbers each process reserves at a time, 1 allocates inside the
+    # completion transaction
+    PRIORITY_NUMBER_BLOCK_SIZE: int = 1
+    # Untaken code ids each process fetches per amount ahead of claims
+    CODE_POOL_BATCH_SIZE: int = 50
+    # Reserve the next batch in the background once a pool is this small
+    CODE_POOL_LOW_WATERMARK: int = 10
+    CODE_RESERVATION_SECONDS: float = 15 * 60
+    CODE_CLAIM_ATTEMPTS: int = 3
+    CODE_INVENTORY_POLL_SECONDS: float = 10
+    CODE_LOW_STOCK_THRESHOLD: int = 20
+    # Prizes added to today's table are picked up after at most this long
+    PRIZE_TABLE_REFRESH_SECONDS: float = 60
+    # How stale the participation count shown in greetings may get
+    PARTICIPATIONS_COUNT_TTL_SECONDS: float = 5
+    # embedded: participations keep a full copy of the user
+    # referenced: participations keep {_id, phone} and the user is joined on read
+    PARTICIPATION_USER_MODE: Literal["embedded", "referenced"] = "embedded"
+    # Documents read and written per chunk of a streaming export
+    EXPORT_BATCH_SIZE: int = 500
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Dashboard users are re-read at most this often per process
+    PRINCIPAL_CACHE_SECONDS: float = 30
+    PRINCIPAL_CACHE_SIZE: int = 1024
+    # bcrypt threads, and how many hashes may wait for one before logins get 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16
+    # Logins per username and client within the window before a 429
+    LOGIN_MAX_ATTEMPTS: int = 5
+    LOGIN_WINDOW_SECONDS: float = 60
     BUSINESS_NUMBER: str = "whatsapp:+5215662207751"
     LOCAL_TIMEZONE: ZoneInfo = ZoneInfo("America/Mexico_City")
+    WEBHOOK_QUEUE_ENABLED: bool = False
+    INBOUND_QUEUE_WORKERS: int = 4
+    INBOUND_QUEUE_POLL_SECONDS: float = 1.0
+    INBOUND_QUEUE_VISIBILITY_SECONDS: int = 120
+    INBOUND_QUEUE_MAX_ATTEMPTS: int = 3
+    # First retry delay of a failed message, doubled on every further attempt
+    INBOUND_QUEUE_RETRY_SECONDS: float = 5
+    INBOUND_QUEUE_RETENTION_SECONDS: int = 60 * 60 * 24 * 7
+    PROCESSED_MESSAGES_TTL_SECONDS: int = 60 * 60 * 24 * 2
+    CONVERSATION_LEASE_SECONDS: float = 30
+    CONVERSATION_LEASE_RETRY_SECONDS: float = 0.05
+    # Direct webhooks wait this long for a busy conversation, and still have to
+    # run the flow inside Twilio's 15s webhook timeout, or its retry is dropped
+    CONVERSATION_LEASE_WAIT_SECONDS: float = 5
 
     model_config = SettingsConfigDict(
         env_file='.env', env_file_encoding='utf-8')
@@ -1,9 +1,18 @@
+import asyncio
+import os
+import socket
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+from typing import Deque, Dict, Optional
 from bson import ObjectId
 from fastapi import HTTPException
+from pymongo import ReturnDocument
 
 from app.schemas.participation import Participation
 from app.schemas.prize import Code
 from app.db.db import PrizeCodesCollection, CodeCountersCollection
+from app.core.config import settings
 
 
 async def get_code_by_participation(participation: Participation):
@@ -25,3 +34,113 @@ async def code_counts():
         del doc['_id']
         documents.append(doc)
     return documents
+
+
+class CodePool:
+    """
+    Batches of untaken codes per amount reserved ahead of time for this
+    process, so claiming a code is a single update by _id. A new batch is
+    reserved in the background once a pool drops to low_watermark ids.
+    Reservations expire, so a claim still checks taken and moves on to the
+    next id if another process got the code first.
+    """
+
+    def __init__(self, batch_size: int, low_watermark: int, reservation_seconds: float):
+        self.batch_size = batch_size
+        self.low_watermark = low_watermark
+        self.reservation_seconds = reservation_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._ids: Dict[int, Deque[ObjectId]] = {}
+        self._filling: Dict[int, asyncio.Task] = {}
+
+    def size(self, amount: int) -> int:
+        return len(self._ids.get(amount, ()))
+
+    async def next_id(self, amount: int) -> Optional[ObjectId]:
+        ids = self._ids.setdefault(amount, deque())
+        if not ids:
+            await self.prefetch(amount)
+        elif len(ids) <= self.low_watermark:
+            self.prefetch(amount)
+        return ids.popleft() if ids else None
+
+    def prefetch(self, amount: int) -> asyncio.Task:
+        task = self._filling.get(amount)
+        if not task:
+            task = asyncio.create_task(self._fill(amount))
+            self._filling[amount] = task
+            task.add_done_callback(lambda task: self._filled(amount, task))
+        return task
+
+    def _filled(self, amount: int, task: asyncio.Task):
+        self._filling.pop(amount, None)
+        if not task.cancelled() and task.exception():
+            print(f"Failed to reserve codes of {amount}: {task.exception()}")
+
+    async def _fill(self, amount: int):
+        now = datetime.now(timezone.utc)
+        until = now + timedelta(seconds=self.reservation_seconds)
+        available = {
+            "taken": False,
+            "amount": amount,
+            "$or": [
+                {"reserved_until": {"$exists": False}},
+                {"reserved_until": {"$lt": now}},
+            ],
+        }
+        cursor = PrizeCodesCollection().find(
+            available, {"_id": 1}).limit(self.batch_size)
+        candidates = [code["_id"] async for code in cursor]
+        if not candidates:
+            return
+
+        await PrizeCodesCollection().update_many(
+            {**available, "_id": {"$in": candidates}},
+            {"$set": {"reserved_by": self.owner, "reserved_until": until}}
+        )
+        cursor = PrizeCodesCollection().find(
+            {"_id": {"$in": candidates}, "reserved_by": self.owner, "reserved_until": until},
+            {"_id": 1})
+        self._ids.setdefault(amount, deque()).extend(
+            [code["_id"] async for code in cursor])
+
+    async def release(self):
+        """Gives the reserved codes this process didn't use back to the others."""
+        for task in list(self._filling.values()):
+            task.cancel()
+        self._ids.clear()
+        await PrizeCodesCollection().update_many(
+            {"reserved_by": self.owner, "taken": False},
+            {"$unset": {"reserved_by": "", "reserved_until": ""}}
+        )
+
+    def clear(self):
+        self._ids.clear()
+
+
+code_pool = CodePool(
+    settings.CODE_POOL_BATCH_SIZE,
+    settings.CODE_POOL_LOW_WATERMARK,
+    settings.CODE_RESERVATION_SECONDS,
+)
+
+
+async def claim_code(amount: int, participation_id: ObjectId, session=None) -> Optional[dict]:
+    """Marks an untaken code of amount as taken by the participation and returns it."""
+    while True:
+        code_id = await code_pool.next_id(amount)
+        if code_id:
+            query = {"_id": code_id, "taken": False}
+        else:
+            query = {"taken": False, "amount": amount}
+        code = await PrizeCodesCollection().find_one_and_update(
+            query,
+            {"$set": {
+                "participationId": participation_id,
+                "taken": True,
+            }},
+            session=session,
+            return_document=ReturnDocument.AFTER
+        )
+        if code or not code_id:
+            return code
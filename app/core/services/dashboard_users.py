@@ -3,6 +3,7 @@ from bson import ObjectId
 
 from app.schemas.auth import DisplayDashboardUser
 from app.db.db import DashboardUsersCollection
+from app.core.auth import invalidate_principal
 
 
 async def fetch_dashboard_users() -> List[DisplayDashboardUser]:
@@ -18,6 +19,7 @@ async def delete_dashboard_user_by_id(user_id: str):
     if not ObjectId.is_valid(user_id):
         raise ValueError("Invalid ID")
     object_id = ObjectId(user_id)
-    result = await DashboardUsersCollection().delete_one({"_id": object_id})
-    if not result.deleted_count > 0:
+    user = await DashboardUsersCollection().find_one_and_delete({"_id": object_id})
+    if not user:
         raise ValueError('not found')
+    invalidate_principal(user["username"])
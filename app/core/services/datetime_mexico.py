@@ -1,4 +1,6 @@
-from datetime import datetime, timedelta
+import time as _time
+from datetime import datetime, time, timedelta
+from typing import Callable, Optional
 from zoneinfo import ZoneInfo
 
 from app.core.config import settings
@@ -13,3 +15,42 @@ def get_current_datetime():
 def UTC_to_local(utc_datetime: datetime) -> datetime:
     local_datetime = utc_datetime - timedelta(hours=6)
     return local_datetime
+
+
+def local_to_UTC(local_datetime: datetime) -> datetime:
+    utc_datetime = local_datetime + timedelta(hours=6)
+    return utc_datetime
+
+
+class DayClock:
+    """
+    Caches the local date key ("%Y-%m-%d") until the next local midnight, so
+    per-call code only compares a timestamp instead of formatting a date.
+    """
+
+    def __init__(self, timezone: ZoneInfo, now: Callable[[], float] = _time.time):
+        self.timezone = timezone
+        self.now = now
+        self._key: Optional[str] = None
+        self._rollover = 0.0
+
+    def today_key(self) -> str:
+        timestamp = self.now()
+        if timestamp >= self._rollover:
+            local = datetime.fromtimestamp(timestamp, self.timezone)
+            midnight = datetime.combine(
+                local.date() + timedelta(days=1), time(), tzinfo=self.timezone)
+            self._key = local.strftime("%Y-%m-%d")
+            self._rollover = midnight.timestamp()
+        return self._key
+
+
+clock = DayClock(settings.LOCAL_TIMEZONE)
+
+
+def today_key() -> str:
+    return clock.today_key()
+
+
+def date_key(date: Optional[datetime] = None) -> str:
+    return today_key() if date is None else date.strftime("%Y-%m-%d")
@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from bson import ObjectId
+
+from app.db.db import ParticipationsCollection, MessagesCollection
+from app.core.config import settings
+from app.core.services.participations import build_participations_query, day_range, load_users
+
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+PARTICIPATION_COLUMNS = [
+    "_id",
+    "datetime",
+    "user._id",
+    "user.phone",
+    "user.name",
+    "user.email",
+    "status",
+    "priority_number",
+    "prize",
+    "serial_number",
+    "ticket_url",
+    "ticket_attempts",
+    "flow",
+    "rejection_reason",
+]
+
+MESSAGE_COLUMNS = [
+    "_id",
+    "client_id",
+    "from",
+    "to",
+    "message_sid",
+    "datetime",
+    "text",
+    "photo_url",
+]
+
+
+def _encode(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _column(document: Dict, path: str):
+    value = document
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    if isinstance(value, (ObjectId, datetime)):
+        return _encode(value)
+    return value
+
+
+def format_rows(documents: List[Dict], format: str, columns: List[str]) -> bytes:
+    if format == "ndjson":
+        return "".join(json.dumps(document, default=_encode) + "\n" for document in documents).encode()
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([[_column(document, column) for column in columns]
+                     for document in documents])
+    return buffer.getvalue().encode()
+
+
+def csv_header(columns: List[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue().encode()
+
+
+async def _stream(cursor, format: str, columns: List[str], prepare=None) -> AsyncIterator[bytes]:
+    """Yields the cursor's documents formatted in chunks of EXPORT_BATCH_SIZE."""
+    if format == "csv":
+        yield csv_header(columns)
+
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= settings.EXPORT_BATCH_SIZE:
+            if prepare:
+                await prepare(batch)
+            yield format_rows(batch, format, columns)
+            batch = []
+    if batch:
+        if prepare:
+            await prepare(batch)
+        yield format_rows(batch, format, columns)
+
+
+def stream_participations(
+    format: str,
+    date: Optional[datetime] = None,
+    phone: Optional[str] = None,
+    status: Optional[str] = None,
+) -> AsyncIterator[bytes]:
+    query = build_participations_query(date, phone, status)
+    # Matches the datetime+_id indexes, so the server never sorts in memory
+    cursor = ParticipationsCollection().find(query).sort(
+        [("datetime", 1), ("_id", 1)]).batch_size(settings.EXPORT_BATCH_SIZE)
+    return _stream(cursor, format, PARTICIPATION_COLUMNS, prepare=load_users)
+
+
+def stream_messages(
+    format: str,
+    user_id: Optional[str] = None,
+    date: Optional[datetime] = None,
+) -> AsyncIterator[bytes]:
+    query = {}
+    if user_id:
+        if not ObjectId.is_valid(user_id):
+            raise ValueError("Invalid ID")
+        query["client_id"] = ObjectId(user_id)
+    if date:
+        query["datetime"] = day_range(date)
+    sort = "datetime" if user_id else "_id"
+    cursor = MessagesCollection().find(query).sort(
+        sort, 1).batch_size(settings.EXPORT_BATCH_SIZE)
+    return _stream(cursor, format, MESSAGE_COLUMNS)
@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from pymongo.errors import DuplicateKeyError
+
+from app.db.db import ProcessedMessagesCollection
+
+
+async def claim_message_sid(message_sid: str) -> Optional[Dict]:
+    """
+    Records message_sid as being processed. Returns None the first time a sid
+    is seen, otherwise the response cached for it so retries short-circuit.
+    """
+    if not message_sid:
+        return None
+    try:
+        await ProcessedMessagesCollection().insert_one({
+            "_id": message_sid,
+            "response": None,
+            "created_at": datetime.now(timezone.utc),
+        })
+        return None
+    except DuplicateKeyError:
+        processed = await ProcessedMessagesCollection().find_one({"_id": message_sid})
+        if processed and processed.get("response"):
+            return processed["response"]
+        return {"message": "Already received"}
+
+
+async def store_response(message_sid: str, response: Dict):
+    if not message_sid:
+        return
+    await ProcessedMessagesCollection().update_one(
+        {"_id": message_sid},
+        {"$set": {"response": response}}
+    )
+
+
+async def release_message_sid(message_sid: str):
+    """Forgets a sid whose processing failed so that a retry can run again."""
+    if not message_sid:
+        return
+    await ProcessedMessagesCollection().delete_one({"_id": message_sid})
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from pymongo import ReturnDocument
+
+from app.db.db import InboundMessagesCollection
+from app.core.config import settings
+
+
+class QueueStatus:
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+
+async def enqueue_message(message) -> str:
+    result = await InboundMessagesCollection().insert_one({
+        "sms_message_sid": message.sms_message_sid,
+        "from": message.from_number,
+        "body": message.raw_body,
+        "status": QueueStatus.QUEUED,
+        "attempts": 0,
+        "enqueued_at": datetime.now(timezone.utc),
+    })
+    return str(result.inserted_id)
+
+
+def _claimable_filter() -> Dict:
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=settings.INBOUND_QUEUE_VISIBILITY_SECONDS)
+    return {"$or": [
+        # Messages that never failed have no retry_at
+        {"status": QueueStatus.QUEUED, "retry_at": {"$not": {"$gt": now}}},
+        {"status": QueueStatus.PROCESSING, "started_at": {"$lt": stale}},
+    ]}
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before a message that failed attempts times is tried again."""
+    return settings.INBOUND_QUEUE_RETRY_SECONDS * 2 ** max(attempts - 1, 0)
+
+
+async def next_conversation(exclude: List[str]) -> Optional[str]:
+    """Phone number of the oldest claimable message, skipping busy phones."""
+    query = _claimable_filter()
+    if exclude:
+        query["from"] = {"$nin": exclude}
+    job = await InboundMessagesCollection().find_one(
+        query,
+        sort=[("enqueued_at", 1)],
+        projection={"from": 1},
+    )
+    return job["from"] if job else None
+
+
+async def claim_message(worker: str, phone: str) -> Optional[Dict]:
+    """
+    Atomically takes the oldest claimable message for phone. Messages left in
+    processing by a worker that died are taken again once the visibility
+    timeout expires, before any newer message of the same conversation. Failed
+    messages are retried after retry_delay, and nothing newer of the same
+    conversation is taken meanwhile.
+    """
+    # A message waiting for its retry holds back the rest of its conversation
+    waiting = await InboundMessagesCollection().find_one(
+        {"from": phone, "status": QueueStatus.QUEUED,
+            "retry_at": {"$gt": datetime.now(timezone.utc)}},
+        projection={"_id": 1},
+    )
+    if waiting:
+        return None
+
+    query = _claimable_filter()
+    query["from"] = phone
+    return await InboundMessagesCollection().find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": QueueStatus.PROCESSING,
+                "worker": worker,
+                "started_at": datetime.now(timezone.utc),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("enqueued_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def complete_message(job: Dict):
+    await InboundMessagesCollection().update_one(
+        {"_id": job["_id"]},
+        {"$set": {
+            "status": QueueStatus.DONE,
+            "finished_at": datetime.now(timezone.utc),
+        }}
+    )
+
+
+async def fail_message(job: Dict, error: Exception):
+    attempts = job.get("attempts", 0)
+    if attempts < settings.INBOUND_QUEUE_MAX_ATTEMPTS:
+        update = {
+            "status": QueueStatus.QUEUED,
+            "error": str(error),
+            "retry_at": datetime.now(timezone.utc) + timedelta(seconds=retry_delay(attempts)),
+        }
+    else:
+        update = {
+            "status": QueueStatus.FAILED,
+            "error": str(error),
+            "finished_at": datetime.now(timezone.utc),
+        }
+    await InboundMessagesCollection().update_one({"_id": job["_id"]}, {"$set": update})
+
+
+async def queue_stats() -> Dict:
+    collection = InboundMessagesCollection()
+    depth = await collection.count_documents({"status": QueueStatus.QUEUED})
+    processing = await collection.count_documents({"status": QueueStatus.PROCESSING})
+    failed = await collection.count_documents({"status": QueueStatus.FAILED})
+
+    lag = 0.0
+    oldest = await collection.find_one(
+        {"status": QueueStatus.QUEUED},
+        sort=[("enqueued_at", 1)],
+        projection={"enqueued_at": 1},
+    )
+    if oldest:
+        enqueued_at = oldest["enqueued_at"]
+        if enqueued_at.tzinfo is None:
+            enqueued_at = enqueued_at.replace(tzinfo=timezone.utc)
+        lag = (datetime.now(timezone.utc) - enqueued_at).total_seconds()
+
+    return {
+        "depth": depth,
+        "processing": processing,
+        "failed": failed,
+        "lag_seconds": lag,
+    }
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set
+
+from app.db.db import CodeCountersCollection
+from app.core.config import settings
+from app.core.services.codes import code_pool
+
+
+logger = logging.getLogger(__name__)
+
+
+class CodeInventory:
+    """
+    Code availability per amount kept in memory for the dashboard. The small
+    prize_counters collection is polled every poll_seconds and claims made by
+    this process are applied right away. Each poll also tops up the reserved
+    code pools, and a warning is logged when an amount drops under low_stock.
+    """
+
+    def __init__(self, poll_seconds: float, low_stock: int):
+        self.poll_seconds = poll_seconds
+        self.low_stock = low_stock
+        self.counts: Dict[int, Dict] = {}
+        self.loaded = False
+        self._low: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.loaded = False
+        await code_pool.release()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+                for amount, counts in self.counts.items():
+                    if counts.get("available", 0) > 0 and code_pool.size(amount) <= code_pool.low_watermark:
+                        code_pool.prefetch(amount)
+            except Exception as e:
+                logger.error(f"Failed to refresh code inventory: {e}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def refresh(self):
+        counts = {}
+        async for doc in CodeCountersCollection().find():
+            amount = doc.pop("_id")
+            counts[amount] = doc
+        self.counts = counts
+        self.loaded = True
+        self._check_stock()
+
+    def record_claim(self, amount: int):
+        counts = self.counts.get(amount)
+        if not counts:
+            return
+        counts["taken"] = counts.get("taken", 0) + 1
+        counts["available"] = counts.get("available", 0) - 1
+        self._check_stock()
+
+    def snapshot(self) -> List[Dict]:
+        return [{**counts, "amount": amount} for amount, counts in self.counts.items()]
+
+    def _check_stock(self):
+        for amount, counts in self.counts.items():
+            available = counts.get("available", 0)
+            if available < self.low_stock:
+                if amount not in self._low:
+                    self._low.add(amount)
+                    logger.warning(
+                        f"Low stock of {amount} codes: {available} available")
+            else:
+                self._low.discard(amount)
+
+
+code_inventory = CodeInventory(
+    settings.CODE_INVENTORY_POLL_SECONDS,
+    settings.CODE_LOW_STOCK_THRESHOLD,
+)
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
+
+from app.db.db import ConversationLeasesCollection
+
+
+async def acquire_lease(key: str, owner: str, seconds: float) -> bool:
+    now = datetime.now(timezone.utc)
+    try:
+        # Upserting over a live lease held by someone else collides on _id
+        await ConversationLeasesCollection().update_one(
+            {"_id": key, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def renew_lease(key: str, owner: str, seconds: float) -> bool:
+    now = datetime.now(timezone.utc)
+    result = await ConversationLeasesCollection().update_one(
+        {"_id": key, "owner": owner},
+        {"$set": {"expires_at": now + timedelta(seconds=seconds)}}
+    )
+    return result.matched_count > 0
+
+
+async def release_lease(key: str, owner: str):
+    await ConversationLeasesCollection().delete_one({"_id": key, "owner": owner})
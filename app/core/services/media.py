@@ -0,0 +1,149 @@
+import asyncio
+import aiohttp
+from urllib.parse import quote
+from google.auth.transport.requests import Request
+
+from app.core.config import settings
+from app.core.services.tickets import get_credentials
+
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+}
+
+
+class _MediaSessionSingleton:
+    """
+    Pooled aiohttp session and concurrency limit for media ingestion. Created
+    on first use so both bind to the running event loop.
+    """
+    session: aiohttp.ClientSession | None = None
+    semaphore: asyncio.Semaphore | None = None
+    token_lock: asyncio.Lock | None = None
+
+    def __new__(cls):
+        if not hasattr(cls, 'instance'):
+            cls.instance = super(_MediaSessionSingleton, cls).__new__(cls)
+            cls.instance.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(
+                    total=settings.MEDIA_TIMEOUT_SECONDS,
+                    sock_connect=settings.MEDIA_CONNECT_TIMEOUT_SECONDS,
+                ),
+            )
+            cls.instance.semaphore = asyncio.Semaphore(
+                settings.MEDIA_MAX_CONCURRENCY)
+            cls.instance.token_lock = asyncio.Lock()
+        return cls.instance
+
+
+async def close_media_session():
+    if hasattr(_MediaSessionSingleton, 'instance'):
+        await _MediaSessionSingleton.instance.session.close()
+        del _MediaSessionSingleton.instance
+
+
+async def get_access_token() -> str:
+    credentials = await get_credentials()
+    if not credentials.valid:
+        async with _MediaSessionSingleton().token_lock:
+            if not credentials.valid:
+                await asyncio.to_thread(credentials.refresh, Request())
+    return credentials.token
+
+
+class ResumableUpload:
+    """
+    GCS resumable upload session fed chunk by chunk. Every chunk but the last
+    must be a multiple of 256 KiB, the total size is only sent with the last.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, bucket: str, name: str, content_type: str, token: str, base_url: str):
+        self.session = session
+        self.bucket = bucket
+        self.name = name
+        self.content_type = content_type
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.upload_url = None
+        self.offset = 0
+
+    async def start(self):
+        url = f"{self.base_url}/upload/storage/v1/b/{quote(self.bucket, safe='')}/o"
+        async with self.session.post(
+            url,
+            params={"uploadType": "resumable", "name": self.name},
+            json={"name": self.name, "contentType": self.content_type},
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                "X-Upload-Content-Type": self.content_type,
+            },
+        ) as response:
+            if response.status != 200:
+                raise Exception(
+                    f"Failed to start upload: {response.status} {await response.text()}")
+            self.upload_url = response.headers["Location"]
+
+    async def send(self, chunk: bytes, last: bool = False):
+        start = self.offset
+        end = start + len(chunk) - 1
+        total = str(start + len(chunk)) if last else "*"
+        async with self.session.put(
+            self.upload_url,
+            data=chunk,
+            headers={
+                "Content-Range": f"bytes {start}-{end}/{total}",
+                "Content-Type": self.content_type,
+            },
+        ) as response:
+            expected = (200, 201) if last else (308,)
+            if response.status not in expected:
+                raise Exception(
+                    f"Failed to upload chunk: {response.status} {await response.text()}")
+        self.offset += len(chunk)
+
+
+async def stream_media_to_gcp(media_url: str, destination: str, token: str = None) -> str:
+    """
+    Streams a Twilio media file into the tickets bucket without holding the
+    whole image in memory.
+    Args:
+        media_url (str): The URL of the media sent by Twilio.
+        destination (str): The blob name without extension.
+        token (str): Optional GCS access token, fetched when not given.
+    Returns:
+        str: The name of the uploaded blob in the bucket.
+    """
+    media = _MediaSessionSingleton()
+    chunk_size = settings.MEDIA_CHUNK_SIZE
+
+    async with media.semaphore:
+        async with media.session.get(media_url) as response:
+            response.raise_for_status()
+            content_type = response.content_type
+            if content_type not in EXTENSIONS:
+                raise ValueError("Invalid file type")
+            filename = f"{destination}.{EXTENSIONS[content_type]}"
+
+            upload = ResumableUpload(
+                media.session,
+                settings.TICKET_BUCKET_NAME,
+                filename,
+                content_type,
+                token or await get_access_token(),
+                settings.GCS_API_URL,
+            )
+            await upload.start()
+
+            buffer = bytearray()
+            async for data in response.content.iter_chunked(64 * 1024):
+                buffer.extend(data)
+                # Keep at least one byte back so the last chunk is never empty
+                while len(buffer) > chunk_size:
+                    await upload.send(bytes(buffer[:chunk_size]))
+                    del buffer[:chunk_size]
+
+            if not buffer:
+                raise ValueError("Empty media file")
+            await upload.send(bytes(buffer), last=True)
+
+    return filename
@@ -1,5 +1,6 @@
 from bson import ObjectId
 from datetime import datetime, timezone
+from typing import Dict, List, Optional
 
 from app.schemas.user import User
 from app.db.db import _MongoClientSingleton, MessagesCollection
@@ -7,7 +8,7 @@ from app.core.services.datetime_mexico import *
 from app.core.config import settings
 
 
-async def save_message(message_sid: str, user: User, from_user: bool = False):
+async def save_message(message_sid: str, user: User, from_user: bool = False, text: Optional[str] = None, photo_url: Optional[str] = None, body_pending: bool = False):
     async with await _MongoClientSingleton().mongo_client.start_session() as session:
         async with session.start_transaction():
             try:
@@ -16,8 +17,12 @@ async def save_message(message_sid: str, user: User, from_user: bool = False):
                     "from": user.phone if from_user else settings.BUSINESS_NUMBER,
                     "to": settings.BUSINESS_NUMBER if from_user else user.phone,
                     "message_sid": message_sid,
-                    "datetime": datetime.now(timezone.utc)
+                    "datetime": datetime.now(timezone.utc),
                 }
+                # Without text the message is backfilled from Twilio later
+                if not body_pending:
+                    document["text"] = text
+                    document["photo_url"] = photo_url
 
                 await MessagesCollection().insert_one(document, session=session)
 
@@ -25,3 +30,21 @@ async def save_message(message_sid: str, user: User, from_user: bool = False):
                 print(e)
                 await session.abort_transaction()
                 raise e
+
+
+async def fetch_messages(user_id: str, limit: Optional[int] = None, before: Optional[datetime] = None) -> List[Dict]:
+    query = {"client_id": ObjectId(user_id)}
+    if before:
+        query["datetime"] = {"$lt": before}
+
+    cursor = MessagesCollection().find(query).sort("datetime", -1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return [message async for message in cursor]
+
+
+async def save_message_body(id: ObjectId, text: Optional[str], photo_url: Optional[str]):
+    await MessagesCollection().update_one(
+        {"_id": id},
+        {"$set": {"text": text, "photo_url": photo_url}}
+    )
@@ -1,33 +1,42 @@
+import base64
+import json
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from bson import ObjectId
-from pymongo.errors import InvalidDocument
+from pymongo import ReturnDocument
+from pymongo.errors import InvalidDocument, PyMongoError
 from fastapi import HTTPException
 from zoneinfo import ZoneInfo
 
 from app.schemas.participation import Participation, Status, ParticipationCreation
 from app.db.db import ParticipationsCollection, PrizeCodesCollection, _MongoClientSingleton, CodeCountersCollection
 from app.chatbot.steps import Steps
-from app.core.services.users import fetch_user_by_phone, update_user_by_phone
+from app.core.services.codes import claim_code
+from app.core.services.inventory import code_inventory
+from app.core.services.users import fetch_user_by_phone, update_user_by_phone, fetch_users_by_phones, references_users, user_reference
 from app.core.config import settings
 from app.core.services.datetime_mexico import *
 
 
-async def fetch_participations(
-    limit: Optional[int] = None,
+def day_range(date: datetime) -> Dict:
+    """The UTC range of the local day of date, as a datetime filter."""
+    start_of_day = datetime(date.year, date.month,
+                            date.day, tzinfo=settings.LOCAL_TIMEZONE)
+    end_of_day = start_of_day + timedelta(days=1)
+    start_of_day_utc = start_of_day.astimezone(ZoneInfo("UTC"))
+    end_of_day_utc = end_of_day.astimezone(ZoneInfo("UTC"))
+    return {"$gte": start_of_day_utc, "$lt": end_of_day_utc}
+
+
+def build_participations_query(
     date: Optional[datetime] = None,
     phone: Optional[str] = None,
     status: Optional[str] = None
-) -> List[Participation]:
+) -> Dict:
     query = {}
 
     if date:
-        start_of_day = datetime(date.year, date.month,
-                                date.day, tzinfo=settings.LOCAL_TIMEZONE)
-        end_of_day = start_of_day + timedelta(days=1)
-        start_of_day_utc = start_of_day.astimezone(ZoneInfo("UTC"))
-        end_of_day_utc = end_of_day.astimezone(ZoneInfo("UTC"))
-        query["datetime"] = {"$gte": start_of_day_utc, "$lt": end_of_day_utc}
+        query["datetime"] = day_range(date)
 
     if phone:
         query["user.phone"] = phone
@@ -35,22 +44,144 @@ async def fetch_participations(
     if status:
         query["status"] = status
 
+    return query
+
+
+async def load_users(participations: List[Dict]) -> List[Dict]:
+    """
+    Joins the users of referenced participations with a single query for the
+    whole batch. Embedded participations are returned untouched.
+    """
+    if not references_users():
+        return participations
+
+    phones = {
+        participation["user"]["phone"]
+        for participation in participations
+        if participation.get("user", {}).get("phone")
+    }
+    if not phones:
+        return participations
+
+    users = await fetch_users_by_phones(phones)
+    for participation in participations:
+        user = users.get(participation.get("user", {}).get("phone"))
+        if user:
+            participation["user"] = dict(user)
+    return participations
+
+
+def participation_changes(participation: Participation, fields: Optional[List[str]] = None) -> Dict:
+    changes = participation.changes(fields)
+    if references_users():
+        user_changed = "user" in changes
+        changes = {
+            path: value for path, value in changes.items()
+            if path != "user" and not path.startswith("user.")
+        }
+        if user_changed:
+            changes["user"] = user_reference(participation.user.to_dict())
+    return changes
+
+
+async def fetch_participations(
+    limit: Optional[int] = None,
+    date: Optional[datetime] = None,
+    phone: Optional[str] = None,
+    status: Optional[str] = None
+) -> List[Participation]:
+    query = build_participations_query(date, phone, status)
+
     cursor = ParticipationsCollection().find(query)
 
     if limit:
         cursor = cursor.limit(limit)
 
+    documents = await load_users([participation async for participation in cursor])
+
     participations = []
-    async for participation in cursor:
+    for participation in documents:
         participation["_id"] = str(participation["_id"])
         try:
-            participation = Participation(**participation)
+            participation = Participation.from_document(participation)
         except Exception as e:
             raise e
         participations.append(participation)
     return participations
 
 
+def encode_cursor(participation: Dict) -> str:
+    position = {
+        "datetime": participation["datetime"].isoformat(),
+        "_id": str(participation["_id"]),
+    }
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(position["datetime"]), ObjectId(position["_id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+async def fetch_participations_page(
+    limit: Optional[int] = None,
+    date: Optional[datetime] = None,
+    phone: Optional[str] = None,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Keyset paginated participations ordered by (datetime, _id), as raw
+    documents. Returns the page and the cursor of the next one, if any.
+    """
+    query = build_participations_query(date, phone, status)
+
+    if cursor:
+        last_datetime, last_id = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"datetime": {"$gt": last_datetime}},
+            {"datetime": last_datetime, "_id": {"$gt": last_id}},
+        ]}]}
+
+    projection = None
+    user_fields = []
+    if fields:
+        projection = {field: 1 for field in fields}
+        projection["datetime"] = 1
+        user_fields = [field[len("user."):]
+                       for field in fields if field.startswith("user.")]
+        if references_users() and user_fields:
+            projection = {field: 1 for field in projection
+                          if not field.startswith("user.")}
+            projection["user.phone"] = 1
+
+    documents = ParticipationsCollection().find(query, projection).sort(
+        [("datetime", 1), ("_id", 1)])
+    if limit:
+        # One extra document tells whether there is a next page
+        documents = documents.limit(limit + 1)
+
+    participations = [participation async for participation in documents]
+    if not fields or "user" in fields or user_fields:
+        await load_users(participations)
+        if references_users() and user_fields:
+            for participation in participations:
+                user = participation.get("user", {})
+                participation["user"] = {
+                    field: user[field] for field in user_fields if field in user}
+
+    next_cursor = None
+    if limit and len(participations) > limit:
+        participations = participations[:limit]
+        next_cursor = encode_cursor(participations[-1])
+
+    return participations, next_cursor
+
+
 async def fetch_participation_by_id(id: str) -> Participation:
     if not ObjectId.is_valid(id):
         raise ValueError("Invalid ID")
@@ -58,16 +189,18 @@ async def fetch_participation_by_id(id: str) -> Participation:
     existing_participation = await ParticipationsCollection().find_one({"_id": object_id})
     if not existing_participation:
         raise ValueError("Participation not found")
+    await load_users([existing_participation])
     existing_participation["_id"] = str(existing_participation["_id"])
-    return Participation(**existing_participation)
+    return Participation.from_document(existing_participation)
 
 
 async def fetch_participation_by_phone(phone: str) -> Participation:
     existing_participation = await ParticipationsCollection().find_one({"user.phone": phone})
     if not existing_participation:
         raise ValueError("Participation not found")
+    await load_users([existing_participation])
     existing_participation["_id"] = str(existing_participation["_id"])
-    return Participation(**existing_participation)
+    return Participation.from_document(existing_participation)
 
 
 async def create_participation(
@@ -84,7 +217,7 @@ async def create_participation(
     try:
         result = await ParticipationsCollection().insert_one({
             "datetime": get_current_datetime(),
-            "user": user,
+            "user": user_reference(user) if references_users() else user,
             "status": Status.INCOMPLETE.value,
             "flow": flow,
         })
@@ -96,9 +229,10 @@ async def create_participation(
         raise e
 
     new_participation = await ParticipationsCollection().find_one({"_id": result.inserted_id})
+    await load_users([new_participation])
     new_participation["_id"] = str(new_participation["_id"])
 
-    return Participation(**new_participation)
+    return Participation.from_document(new_participation)
 
 
 async def accept_participation(participation: Participation, serial_number: str) -> bool:
@@ -114,62 +248,76 @@ async def accept_participation(participation: Participation, serial_number: str)
     if existing:
         raise ValueError("Duplicate Serial Number")
 
-    available_code = await PrizeCodesCollection().find_one({
-        "taken": False,
-        "amount": int(participation.prize)
-    })
-
-    if not available_code:
-        raise HTTPException(status_code=404, detail="No available code found")
-
-    async with await _MongoClientSingleton().mongo_client.start_session() as session:
-        async with session.start_transaction():
-            try:
-                participation.serial_number = serial_number
-                await ParticipationsCollection().update_one(
-                    {"_id": id},
-                    {"$set": {
-                        "serial_number": serial_number,
-                    }}
-                )
-
-                await PrizeCodesCollection().update_one(
-                    {"_id": available_code['_id']},
-                    {"$set": {
-                        "participationId": id,
-                        "taken": True,
-                    }}
-                )
-
-                await CodeCountersCollection().update_one(
-                    {"_id": int(available_code['amount'])},
-                    {"$inc": {
-                        "taken": 1,
-                        "available": -1
-                    }}
-                )
-            except Exception as e:
-                print(e)
-                await session.abort_transaction()
+    amount = int(participation.prize)
+    for attempt in range(settings.CODE_CLAIM_ATTEMPTS):
+        try:
+            async with await _MongoClientSingleton().mongo_client.start_session() as session:
+                async with session.start_transaction():
+                    try:
+                        code = await claim_code(amount, id, session)
+                        if not code:
+                            raise HTTPException(
+                                status_code=404, detail="No available code found")
+
+                        await ParticipationsCollection().update_one(
+                            {"_id": id},
+                            {"$set": {
+                                "serial_number": serial_number,
+                            }},
+                            session=session
+                        )
+
+                        await CodeCountersCollection().update_one(
+                            {"_id": amount},
+                            {"$inc": {
+                                "taken": 1,
+                                "available": -1
+                            }},
+                            session=session
+                        )
+                    except Exception as e:
+                        print(e)
+                        await session.abort_transaction()
+                        raise e
+            break
+        except PyMongoError as e:
+            # Another reviewer claimed the same code, retry with the next one
+            if attempt + 1 == settings.CODE_CLAIM_ATTEMPTS or not e.has_error_label("TransientTransactionError"):
                 raise e
 
+    code_inventory.record_claim(amount)
+    participation.serial_number = serial_number
+    participation.mark_clean("serial_number")
     return 'accepted'
 
 
-async def update_participation(id: str, participation: Participation):
+async def update_participation(id: str, participation: Participation, fields: Optional[List[str]] = None):
+    """
+    Saves the fields of participation modified since it was loaded and returns
+    the stored document. When fields is given only those fields are written.
+    """
     if not ObjectId.is_valid(id):
         raise ValueError("Invalid ID")
     object_id = ObjectId(id)
-    new_participation = participation.to_dict()
-    new_participation.pop("_id", None)
-
-    await ParticipationsCollection().update_one({"_id": object_id}, {"$set": new_participation})
-
-    updated_participation = await ParticipationsCollection().find_one({"_id": object_id})
+    changes = participation_changes(participation, fields)
+
+    if changes:
+        updated_participation = await ParticipationsCollection().find_one_and_update(
+            {"_id": object_id},
+            {"$set": changes},
+            return_document=ReturnDocument.AFTER
+        )
+    else:
+        updated_participation = await ParticipationsCollection().find_one({"_id": object_id})
     if not updated_participation:
         raise ValueError("Participation not found after update")
+    if fields is None:
+        participation.mark_clean()
+    elif fields:
+        participation.mark_clean(*fields)
+    await load_users([updated_participation])
     updated_participation["_id"] = str(updated_participation["_id"])
-    return Participation(**updated_participation)
+    return Participation.from_document(updated_participation)
 
 
 async def delete_participation_by_id(id: str):
@@ -180,18 +328,23 @@ async def delete_participation_by_id(id: str):
     await ParticipationsCollection().delete_one({"_id": object_id})
 
 
-async def add_participation(participation: Participation):
+async def add_participation(participation: Participation, unit_of_work=None):
     phone = participation.user.phone
     if not phone:
         raise ValueError("Phone number is required")
-    user = await fetch_user_by_phone(phone)
+    user = unit_of_work.user(phone) if unit_of_work else None
+    if not user:
+        user = await fetch_user_by_phone(phone)
     if not user:
         raise ValueError("User not found")
 
-    today = get_current_datetime().strftime("%Y-%m-%d")
+    today = today_key()
 
     user.submissions[today] = user.submissions.get(today, 0) + 1
-    await update_user_by_phone(phone, user)
+    if unit_of_work:
+        unit_of_work.register_user(user)
+    else:
+        await update_user_by_phone(phone, user)
 
 
 async def upload_attempt(participation: Participation):
@@ -212,6 +365,7 @@ async def upload_attempt(participation: Participation):
 
                 ticket_attempts = result["ticket_attempts"]
                 participation.ticket_attempts = ticket_attempts
+                participation.mark_clean("ticket_attempts")
 
                 if ticket_attempts >= settings.INVALID_PHOTO_MAX_OPPORTUNITIES:
                     participation.status = Status.REJECTED.value
@@ -220,6 +374,7 @@ async def upload_attempt(participation: Participation):
                         {'$set': {'status': Status.REJECTED.value}},
                         session=session
                     )
+                    participation.mark_clean("status")
 
             except Exception as e:
                 print(e)
@@ -1,60 +1,260 @@
+import asyncio
+import heapq
+from time import monotonic
 from datetime import datetime
 from bson import ObjectId
-from typing import Dict
+from pymongo import ReturnDocument
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 from app.db.db import _MongoClientSingleton, ParticipationsCollection, CountersCollection, PrizesCollection
 from app.schemas.participation import Participation, Status
+from app.core.services.participations import participation_changes
+from app.core.config import settings
 from app.core.services.datetime_mexico import *
 
 
-async def count_participations(date: datetime = get_current_datetime()) -> int:
-    date = date.strftime("%Y-%m-%d")
-    print(date)
-    count = await CountersCollection().find_one({"_id": date})
-    return count["value"] if count else 0
+async def count_participations(date: Optional[datetime] = None) -> int:
+    count = await CountersCollection().find_one({"_id": date_key(date)})
+    if not count:
+        return 0
+    # value also covers numbers reserved in blocks that nobody completed yet
+    if "issued" in count:
+        return count["issued"]
+    return count["value"] - len(count.get("released", []))
 
 
-async def get_prize(priority_number: int, date: datetime, session) -> Dict:
-    date = date.strftime("%Y-%m-%d")
-    print(date)
+class PrizeTable:
+    """
+    The day's untaken prize numbers kept in memory, so numbers that win nothing
+    skip the prizes query. Loaded at startup, when the day rolls over and every
+    refresh_seconds to pick up prizes added during the day.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.day: Optional[str] = None
+        self.numbers: Set[int] = set()
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _stale(self, day: str) -> bool:
+        return day != self.day or asyncio.get_running_loop().time() - self._loaded_at >= self.refresh_seconds
+
+    async def load(self, day: Optional[str] = None):
+        day = day or today_key()
+        numbers = await PrizesCollection().distinct(
+            "priority_number", {"date": day, "taken": False})
+        self.numbers = set(numbers)
+        self.day = day
+        self._loaded_at = asyncio.get_running_loop().time()
+
+    async def may_win(self, day: str, priority_number: int) -> bool:
+        if self._stale(day):
+            async with self._lock:
+                if self._stale(day):
+                    await self.load(day)
+        return priority_number in self.numbers
+
+    def discard(self, day: str, priority_number: int):
+        if day == self.day:
+            self.numbers.discard(priority_number)
+
+    def clear(self):
+        self.day = None
+        self.numbers = set()
+
+
+prize_table = PrizeTable(settings.PRIZE_TABLE_REFRESH_SECONDS)
+
+
+async def get_prize(priority_number: int, date: Optional[datetime] = None, session=None, day: Optional[str] = None) -> Dict:
+    """Takes the prize of priority_number on day, a day key, or on date."""
+    day = day or date_key(date)
+    if not await prize_table.may_win(day, priority_number):
+        return None
     prize = await PrizesCollection().find_one_and_update(
-        {"priority_number": priority_number, "date": date, "taken": False},
+        {"priority_number": priority_number, "date": day, "taken": False},
         {"$set": {"taken": True}},
         session=session,
     )
+    if not prize:
+        prize_table.discard(day, priority_number)
     return prize["type"] if prize else None
 
 
+class PriorityNumberAllocator:
+    """
+    Hands out the day's priority numbers from blocks reserved on the counter
+    document, so completion transactions don't all write to it. Each
+    completion still bumps the counter's issued count after committing.
+    Numbers left when the process stops are pushed to the counter's released
+    list and handed out first by the next reservation of any process.
+    """
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self.day: Optional[str] = None
+        self._free: List[int] = []
+        self._lock = asyncio.Lock()
+
+    async def allocate(self) -> Tuple[str, int]:
+        async with self._lock:
+            day = today_key()
+            if day != self.day:
+                await self._release()
+                self.day = day
+            if not self._free:
+                self._free = await self._reserve(day)
+            return day, heapq.heappop(self._free)
+
+    def give_back(self, day: str, priority_number: int):
+        """Returns a number whose completion failed so it is handed out again."""
+        if day == self.day:
+            heapq.heappush(self._free, priority_number)
+
+    async def close(self):
+        async with self._lock:
+            await self._release()
+
+    async def _reserve(self, day: str) -> List[int]:
+        numbers = []
+        while len(numbers) < self.block_size:
+            result = await CountersCollection().find_one_and_update(
+                {"_id": day, "released.0": {"$exists": True}},
+                {"$pop": {"released": -1}},
+                return_document=ReturnDocument.BEFORE
+            )
+            if not result:
+                break
+            numbers.append(result["released"][0])
+        if numbers:
+            heapq.heapify(numbers)
+            return numbers
+
+        result = await CountersCollection().find_one_and_update(
+            {"_id": day},
+            {"$inc": {"value": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return list(range(result["value"] - self.block_size + 1, result["value"] + 1))
+
+    async def _release(self):
+        if self.day and self._free:
+            await CountersCollection().update_one(
+                {"_id": self.day},
+                {"$push": {"released": {"$each": sorted(self._free), "$sort": 1}}}
+            )
+        self._free = []
+
+
+priority_numbers = PriorityNumberAllocator(settings.PRIORITY_NUMBER_BLOCK_SIZE)
+
+
 async def set_priority_number(participation: Participation):
-    today = get_current_datetime().strftime("%Y-%m-%d")
+    today = today_key()
     priority_number = -1
-    async with await _MongoClientSingleton().mongo_client.start_session() as session:
-        async with session.start_transaction():
-            try:
-                result = await CountersCollection().find_one_and_update(
-                    {"_id": today},
-                    {"$inc": {"value": 1}},
-                    upsert=True,
-                    session=session,
-                    return_document=True
-                )
-                priority_number = result["value"]
-                participation.priority_number = priority_number
-                participation.status = Status.COMPLETE.value
-                participation.prize = await get_prize(priority_number, get_current_datetime(), session)
-
-                object_id = ObjectId(participation.id)
-                updated_participation = participation.to_dict()
-                updated_participation.pop("_id", None)
-
-                await ParticipationsCollection().update_one(
-                    {"_id": object_id},
-                    {"$set": updated_participation},
-                    session=session
-                )
-
-            except Exception as e:
-                await session.abort_transaction()
-                raise e
+    from_block = priority_numbers.block_size > 1
+    if from_block:
+        today, priority_number = await priority_numbers.allocate()
+    try:
+        async with await _MongoClientSingleton().mongo_client.start_session() as session:
+            async with session.start_transaction():
+                try:
+                    if priority_number == -1:
+                        result = await CountersCollection().find_one_and_update(
+                            {"_id": today},
+                            {"$inc": {"value": 1, "issued": 1}},
+                            upsert=True,
+                            session=session,
+                            return_document=True
+                        )
+                        priority_number = result["value"]
+                    participation.priority_number = priority_number
+                    participation.status = Status.COMPLETE.value
+                    # The day the number was issued for, even if midnight passed since
+                    participation.prize = await get_prize(priority_number, session=session, day=today)
+
+                    object_id = ObjectId(participation.id)
+                    await ParticipationsCollection().update_one(
+                        {"_id": object_id},
+                        {"$set": participation_changes(participation)},
+                        session=session
+                    )
+
+                except Exception as e:
+                    await session.abort_transaction()
+                    raise e
+    except Exception as e:
+        # Covers a failed commit too, the number was never used
+        if from_block:
+            priority_numbers.give_back(today, priority_number)
+        raise e
 
+    participation.mark_clean()
+    if from_block:
+        # Outside the transaction, so completions don't conflict on the counter
+        await CountersCollection().update_one({"_id": today}, {"$inc": {"issued": 1}})
+    else:
+        # A number from a block can be ahead of the numbers other processes gave
+        participations_counter.store(today, priority_number)
     return bool(participation.prize)
+
+
+class CachedCounter:
+    """
+    Serves the daily participation count from memory. Concurrent readers of a
+    missing day share one query, and a value older than ttl_seconds is still
+    served while a single background query refreshes it.
+    """
+
+    def __init__(self, loader: Callable[[Optional[datetime]], Awaitable[int]], ttl_seconds: float, max_days: int = 4, clock: Callable[[], float] = monotonic):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.max_days = max_days
+        self.clock = clock
+        self._values: Dict[str, Tuple[int, float]] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    async def get(self, date: Optional[datetime] = None) -> int:
+        key = date_key(date)
+        cached = self._values.get(key)
+        if not cached:
+            return await asyncio.shield(self._refresh(key, date))
+
+        value, loaded_at = cached
+        if self.clock() - loaded_at >= self.ttl_seconds:
+            self._refresh(key, date)
+        return value
+
+    def store(self, key: str, value: int):
+        """Records a count known to be current, e.g. a priority number just given."""
+        cached = self._values.get(key)
+        self._set(key, max(value, cached[0]) if cached else value)
+
+    def _set(self, key: str, value: int):
+        self._values[key] = (value, self.clock())
+        while len(self._values) > self.max_days:
+            del self._values[min(self._values)]
+
+    def _refresh(self, key: str, date: Optional[datetime]) -> asyncio.Task:
+        task = self._loading.get(key)
+        if not task:
+            task = asyncio.create_task(self._load(key, date))
+            self._loading[key] = task
+            task.add_done_callback(lambda task: self._loaded(key, task))
+        return task
+
+    def _loaded(self, key: str, task: asyncio.Task):
+        self._loading.pop(key, None)
+        if not task.cancelled() and task.exception():
+            print(f"Failed to refresh participation count: {task.exception()}")
+
+    async def _load(self, key: str, date: Optional[datetime]) -> int:
+        value = await self.loader(date)
+        self.store(key, value)
+        return self._values[key][0]
+
+
+participations_counter = CachedCounter(
+    count_participations, settings.PARTICIPATIONS_COUNT_TTL_SECONDS)
@@ -1,40 +1,36 @@
+import asyncio
 import json
 import requests
 import base64
-from google.cloud import storage
 from google.oauth2 import service_account
 
 from app.core.config import settings
 
+GCS_SCOPES = ["https://www.googleapis.com/auth/devstorage.read_write"]
 
-def upload_to_gcp(photo_content: bytes, destination_blob_name: str):
-    """
-    Uploads a photo to Google Cloud Storage bucket.
-    Args:
-        photo_content (bytes): The content of the photo.
-        user_id (str): The ID of the user.
-        bucket_name (str): The name of the GCP bucket.
-        destination_blob_name (str): The name of the blob in the bucket.
-    Returns:
-        str: The path of the uploaded blob in the bucket.
-    """
-    try:
-        credentials = None
-        try:
-            with open(settings.GCP_BUCKET_CREDENTIALS_ADDRESS, 'r') as f:
-                credentials_info = json.load(f)
-            credentials = service_account.Credentials.from_service_account_info(
-                credentials_info)
-        except Exception as e:
-            print(e)
-            raise Exception("Invalid GCP credentials")
+_credentials: service_account.Credentials | None = None
+_credentials_lock = asyncio.Lock()
 
-        gcp_client = storage.Client(credentials=credentials)
-        bucket = gcp_client.bucket(settings.TICKET_BUCKET_NAME)
-        blob = bucket.blob(destination_blob_name)
-        blob.upload_from_string(photo_content, content_type='image/jpeg')
-
-        return True
 
+def load_credentials() -> service_account.Credentials:
+    try:
+        with open(settings.GCP_BUCKET_CREDENTIALS_ADDRESS, 'r') as f:
+            credentials_info = json.load(f)
+        return service_account.Credentials.from_service_account_info(
+            credentials_info, scopes=GCS_SCOPES)
     except Exception as e:
-        raise e
+        print(e)
+        raise Exception("Invalid GCP credentials")
+
+
+async def get_credentials() -> service_account.Credentials:
+    """
+    Service account credentials shared by every upload in the process, read
+    from disk once on a worker thread.
+    """
+    global _credentials
+    if _credentials is None:
+        async with _credentials_lock:
+            if _credentials is None:
+                _credentials = await asyncio.to_thread(load_credentials)
+    return _credentials
@@ -0,0 +1,71 @@
+from typing import Dict, Optional
+from bson import ObjectId
+
+from app.schemas.user import User
+from app.schemas.participation import Participation
+from app.db.db import UsersCollection, ParticipationsCollection, _MongoClientSingleton
+from app.core.services.users import references_users
+from app.core.services.participations import participation_changes
+
+
+class UnitOfWork:
+    """
+    Collects the users and participations modified while handling one message
+    and saves all of their changes in a single transaction on commit.
+    """
+
+    def __init__(self):
+        self.users: Dict[str, User] = {}
+        self.participations: Dict[str, Participation] = {}
+
+    def register_user(self, user: User) -> User:
+        return self.users.setdefault(user.phone, user)
+
+    def register_participation(self, participation: Participation) -> Participation:
+        return self.participations.setdefault(participation.id, participation)
+
+    def user(self, phone: str) -> Optional[User]:
+        return self.users.get(phone)
+
+    async def commit(self):
+        users = [(user, user.changes()) for user in self.users.values()]
+        users = [(user, changes) for user, changes in users if changes]
+        participations = [(participation, participation_changes(participation))
+                          for participation in self.participations.values()]
+        participations = [(participation, changes)
+                          for participation, changes in participations if changes]
+        if not users and not participations:
+            return
+
+        async with await _MongoClientSingleton().mongo_client.start_session() as session:
+            async with session.start_transaction():
+                for user, changes in users:
+                    result = await UsersCollection().update_one(
+                        {"phone": user.phone},
+                        {"$set": changes},
+                        session=session
+                    )
+                    if not result.matched_count:
+                        raise ValueError("User not found")
+                    if not references_users():
+                        await ParticipationsCollection().update_many(
+                            {"user.phone": user.phone},
+                            {"$set": {f"user.{field}": value for field, value in changes.items()}},
+                            session=session
+                        )
+
+                for participation, changes in participations:
+                    if not ObjectId.is_valid(participation.id):
+                        raise ValueError("Invalid ID")
+                    result = await ParticipationsCollection().update_one(
+                        {"_id": ObjectId(participation.id)},
+                        {"$set": changes},
+                        session=session
+                    )
+                    if not result.matched_count:
+                        raise ValueError("Participation not found")
+
+        for user, _ in users:
+            user.mark_clean()
+        for participation, _ in participations:
+            participation.mark_clean()
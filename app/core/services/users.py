@@ -1,5 +1,6 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime
+from pymongo import ReturnDocument
 
 from app.schemas.user import User, UserCreation
 from app.db.db import UsersCollection, ParticipationsCollection, _MongoClientSingleton
@@ -12,7 +13,29 @@ async def fetch_users() -> List[User]:
     users = []
     async for user in cursor:
         user["_id"] = str(user["_id"])
-        users.append(User(**user))
+        users.append(User.from_document(user))
+    return users
+
+
+async def fetch_user_documents() -> List[Dict]:
+    """Raw user documents, for read-only endpoints that skip the models."""
+    return [user async for user in UsersCollection().find()]
+
+
+def references_users() -> bool:
+    return settings.PARTICIPATION_USER_MODE == "referenced"
+
+
+def user_reference(user: Dict) -> Dict:
+    return {"_id": user["_id"], "phone": user["phone"]}
+
+
+async def fetch_users_by_phones(phones: Iterable[str]) -> Dict[str, Dict]:
+    cursor = UsersCollection().find({"phone": {"$in": list(phones)}})
+    users = {}
+    async for user in cursor:
+        user["_id"] = str(user["_id"])
+        users[user["phone"]] = user
     return users
 
 
@@ -21,7 +44,7 @@ async def fetch_user_by_phone(phone: str) -> User:
     if not existing_user:
         raise ValueError("User not found")
     existing_user["_id"] = str(existing_user["_id"])
-    return User(**existing_user)
+    return User.from_document(existing_user)
 
 
 async def create_user(user: UserCreation) -> User:
@@ -41,33 +64,55 @@ async def create_user(user: UserCreation) -> User:
     new_user = await UsersCollection().find_one({"_id": result.inserted_id})
 
     new_user["_id"] = str(new_user["_id"])
-    return User(**new_user)
-
+    return User.from_document(new_user)
 
-async def update_user_by_phone(phone: str, user: User) -> User:
-    old_user = await UsersCollection().find_one({"phone": phone})
-    id = old_user.get("_id")
 
-    new_user = user.to_dict()
-    new_user.pop("_id", None)
+async def update_user_by_phone(phone: str, user: User, fields: Optional[List[str]] = None) -> User:
+    """
+    Saves the fields of user modified since it was loaded and, when users are
+    embedded, copies them into its participations. When fields is given only
+    those fields are written.
+    """
+    new_user = user.changes(fields)
+    if not new_user:
+        return await fetch_user_by_phone(phone)
 
     try:
-        async with await _MongoClientSingleton().mongo_client.start_session() as session:
-            async with session.start_transaction():
-                await UsersCollection().update_one({"_id": id}, {"$set": new_user}, session=session)
-
-                new_user["_id"] = str(id)
-                await ParticipationsCollection().update_many(
-                    {"user.phone": user.phone},
-                    {"$set": {"user": new_user}},
-                    session=session
-                )
+        if references_users():
+            # Participations only keep the phone, nothing to copy
+            updated_user = await UsersCollection().find_one_and_update(
+                {"phone": phone},
+                {"$set": new_user},
+                return_document=ReturnDocument.AFTER
+            )
+            if not updated_user:
+                raise ValueError("User not found")
+        else:
+            async with await _MongoClientSingleton().mongo_client.start_session() as session:
+                async with session.start_transaction():
+                    updated_user = await UsersCollection().find_one_and_update(
+                        {"phone": phone},
+                        {"$set": new_user},
+                        session=session,
+                        return_document=ReturnDocument.AFTER
+                    )
+                    if not updated_user:
+                        raise ValueError("User not found")
+
+                    await ParticipationsCollection().update_many(
+                        {"user.phone": phone},
+                        {"$set": {f"user.{field}": value for field, value in new_user.items()}},
+                        session=session
+                    )
     except Exception as e:
         raise ValueError(f"Error: {e}")
 
-    updated_user = await UsersCollection().find_one({"_id": id})
+    if fields is None:
+        user.mark_clean()
+    else:
+        user.mark_clean(*fields)
     updated_user["_id"] = str(updated_user["_id"])
-    return User(**updated_user)
+    return User.from_document(updated_user)
 
 
 async def delete_user_by_phone(phone: str):
@@ -79,7 +124,7 @@ async def delete_user_by_phone(phone: str):
 
 
 def can_participate(user: User) -> bool:
-    today = get_current_datetime().strftime("%Y-%m-%d")
+    today = today_key()
     submissions = user.submissions.get(today, 0)
     if submissions >= settings.DAILY_PARTICIPAITONS:
         return False
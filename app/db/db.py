@@ -55,6 +55,19 @@ def MessagesCollection() -> AgnosticDatabase:
     return MongoDatabase().messages
 
 
+def InboundMessagesCollection() -> AgnosticDatabase:
+    return MongoDatabase().inbound_messages
+
+
+def ConversationLeasesCollection() -> AgnosticDatabase:
+    return MongoDatabase().conversation_leases
+
+
+def ProcessedMessagesCollection() -> AgnosticDatabase:
+    # _id is the Twilio SmsMessageSid
+    return MongoDatabase().processed_messages
+
+
 def ParticipationLogs() -> AgnosticDatabase:
     return MongoDatabase().participation_logs
 
@@ -0,0 +1,150 @@
+import logging
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from typing import Dict, List
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Every index the services rely on, by collection. Names are left to pymongo
+# so they match indexes created before the registry existed.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("phone", ASCENDING)], unique=True),
+    ],
+    "participations": [
+        # get_current_participation and the dashboard filters
+        IndexModel([("user.phone", ASCENDING), ("status", ASCENDING),
+                    ("datetime", ASCENDING)]),
+        IndexModel([("serial_number", ASCENDING)]),
+        # Keyset pagination of the listing, with and without status
+        IndexModel([("datetime", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("datetime", ASCENDING),
+                    ("_id", ASCENDING)]),
+    ],
+    "prizes": [
+        IndexModel([("priority_number", ASCENDING), ("date", ASCENDING),
+                    ("taken", ASCENDING)]),
+    ],
+    "codes": [
+        IndexModel([("taken", ASCENDING), ("amount", ASCENDING)]),
+        IndexModel([("participationId", ASCENDING)]),
+    ],
+    "messages": [
+        IndexModel([("client_id", ASCENDING), ("datetime", DESCENDING)]),
+    ],
+    "dashboard_users": [
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    "inbound_messages": [
+        IndexModel([("status", ASCENDING), ("enqueued_at", ASCENDING)]),
+        IndexModel([("from", ASCENDING), ("status", ASCENDING),
+                    ("enqueued_at", ASCENDING)]),
+        IndexModel([("finished_at", ASCENDING)],
+                   expireAfterSeconds=settings.INBOUND_QUEUE_RETENTION_SECONDS),
+    ],
+    "conversation_leases": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "processed_messages": [
+        IndexModel([("created_at", ASCENDING)],
+                   expireAfterSeconds=settings.PROCESSED_MESSAGES_TTL_SECONDS),
+    ],
+}
+
+
+def _sample_day():
+    start = datetime(2024, 1, 1)
+    return {"$gte": start, "$lt": start + timedelta(days=1)}
+
+
+# The hot queries of the services, shaped like the real ones. Used by the
+# check mode to make sure none of them falls back to a collection scan.
+QUERIES = [
+    ("users", {"phone": "whatsapp:+5210000000000"}, None),
+    ("participations", {"user.phone": "whatsapp:+5210000000000",
+                        "status": "INCOMPLETE", "datetime": _sample_day()}, None),
+    ("participations", {"serial_number": "0000"}, None),
+    ("participations", {}, [("datetime", ASCENDING), ("_id", ASCENDING)]),
+    ("participations", {"status": "COMPLETE"},
+     [("datetime", ASCENDING), ("_id", ASCENDING)]),
+    ("prizes", {"priority_number": 1, "date": "2024-01-01", "taken": False}, None),
+    ("codes", {"taken": False, "amount": 100}, None),
+    ("codes", {"participationId": ObjectId()}, None),
+    ("messages", {"client_id": ObjectId()}, [("datetime", DESCENDING)]),
+    ("dashboard_users", {"username": "admin"}, None),
+    ("inbound_messages", {"status": "queued"}, [("enqueued_at", ASCENDING)]),
+    ("inbound_messages", {"from": "whatsapp:+5210000000000", "status": "queued"},
+     [("enqueued_at", ASCENDING)]),
+]
+
+
+def _database(db):
+    return db.client[settings.MONGO_DATABASE]
+
+
+async def ensure_indexes(db) -> Dict[str, str]:
+    """Creates the registered indexes, returning the errors by collection."""
+    errors = {}
+    database = _database(db)
+    for collection, indexes in INDEXES.items():
+        try:
+            await database[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error(f"Failed to create indexes on {collection}: {e}")
+            errors[collection] = str(e)
+    return errors
+
+
+async def report_indexes(db) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compares the registry with the database. Lists the registered indexes that
+    are missing, the ones nobody registered, and the ones never used since the
+    server started.
+    """
+    report = {}
+    database = _database(db)
+    for collection, indexes in INDEXES.items():
+        existing = await database[collection].index_information()
+        registered = {index.document["name"] for index in indexes}
+
+        usage = database[collection].aggregate([{"$indexStats": {}}])
+        unused = [
+            stats["name"] async for stats in usage
+            if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0
+        ]
+
+        report[collection] = {
+            "missing": sorted(registered - set(existing)),
+            "unregistered": sorted(set(existing) - registered - {"_id_"}),
+            "unused": sorted(unused),
+        }
+    return report
+
+
+def _collection_scans(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_collection_scans(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_collection_scans(value) for value in plan)
+    return False
+
+
+async def check_queries(db) -> List[str]:
+    """Explains every registered query, returning the ones that scan."""
+    failures = []
+    database = _database(db)
+    for collection, query, sort in QUERIES:
+        cursor = database[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        if _collection_scans(explain["queryPlanner"]["winningPlan"]):
+            failures.append(f"{collection}: {query} sort={sort}")
+    return failures
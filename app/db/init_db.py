@@ -1,6 +1,5 @@
-from app.core.config import settings
+from app.db.indexes import ensure_indexes
 
 
 async def init_db(db) -> None:
-    users_collection = db.client[settings.MONGO_DATABASE].users
-    await users_collection.create_index("phone", unique=True)
+    await ensure_indexes(db)
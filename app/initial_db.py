@@ -1,8 +1,10 @@
 import asyncio
 import logging
+import sys
 from tenacity import after_log, before_log, retry, stop_after_attempt, wait_fixed
 
 from app.db.init_db import init_db
+from app.db.indexes import report_indexes, check_queries
 from app.db.db import MongoDatabase
 
 
@@ -23,11 +25,27 @@ async def populate_db() -> None:
     await init_db(MongoDatabase())
 
 
-async def main() -> None:
+async def check_db() -> bool:
+    db = MongoDatabase()
+    report = await report_indexes(db)
+    for collection, indexes in report.items():
+        for kind, names in indexes.items():
+            if names:
+                logger.warning(f"{collection}: {kind} indexes {names}")
+
+    failures = await check_queries(db)
+    for failure in failures:
+        logger.error(f"Collection scan: {failure}")
+    return not failures
+
+
+async def main(check: bool = False) -> None:
     logger.info("Creating initial data")
     await populate_db()
     logger.info("Initial data created")
+    if check and not await check_db():
+        sys.exit(1)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(check="--check" in sys.argv))
@@ -6,6 +6,11 @@ from contextlib import asynccontextmanager
 from app.core.config import settings
 from app.api.api import api_router
 from app.chatbot.endpoint import router as chatbot_router
+from app.chatbot.workers import worker_pool
+from app.chatbot.messages import close_twilio_client
+from app.core.services.media import close_media_session
+from app.core.services.priority_number import priority_numbers, prize_table
+from app.core.services.inventory import code_inventory
 
 
 load_dotenv()
@@ -15,7 +20,16 @@ load_dotenv()
 async def app_init(app: FastAPI):
     app.include_router(api_router, prefix=settings.API_STR)
     app.include_router(chatbot_router, prefix="/chatbot")
+    if settings.WEBHOOK_QUEUE_ENABLED:
+        worker_pool.start()
+    await prize_table.load()
+    code_inventory.start()
     yield
+    await code_inventory.stop()
+    await worker_pool.stop()
+    await close_twilio_client()
+    await close_media_session()
+    await priority_numbers.close()
 
 
 app = FastAPI(
@@ -29,6 +43,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor"],
 )
 
 
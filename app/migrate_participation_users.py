@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import sys
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.db.db import ParticipationsCollection
+from app.core.services.users import fetch_users_by_phones
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+batch_size = 500
+
+
+async def to_referenced() -> int:
+    """Reduces the embedded user of every participation to {_id, phone}."""
+    result = await ParticipationsCollection().update_many(
+        {"user.name": {"$exists": True}},
+        [{"$set": {"user": {"_id": "$user._id", "phone": "$user.phone"}}}],
+    )
+    return result.modified_count
+
+
+async def to_embedded() -> int:
+    """Copies the current user document back into every participation."""
+    total = 0
+    missing = 0
+    query = {"user.name": {"$exists": False}}
+    while True:
+        cursor = ParticipationsCollection().find(
+            query, {"user.phone": 1}).sort("_id", 1).limit(batch_size)
+        participations = [participation async for participation in cursor]
+        if not participations:
+            break
+        query["_id"] = {"$gt": participations[-1]["_id"]}
+
+        users = await fetch_users_by_phones(
+            participation["user"]["phone"] for participation in participations)
+        updates = [
+            UpdateOne({"_id": participation["_id"]},
+                      {"$set": {"user": users[participation["user"]["phone"]]}})
+            for participation in participations
+            if participation["user"]["phone"] in users
+        ]
+        missing += len(participations) - len(updates)
+        if updates:
+            result = await ParticipationsCollection().bulk_write(updates, ordered=False)
+            total += result.modified_count
+        logger.info(f"Migrated {total} participations")
+
+    if missing:
+        logger.warning(f"Skipped {missing} participations without a user")
+    return total
+
+
+async def main(mode: str) -> None:
+    if mode not in ("embedded", "referenced"):
+        raise ValueError("Mode must be embedded or referenced")
+    if mode != settings.PARTICIPATION_USER_MODE:
+        logger.warning(
+            f"PARTICIPATION_USER_MODE is {settings.PARTICIPATION_USER_MODE}, "
+            f"update it to {mode} before restarting the app")
+
+    logger.info(f"Migrating participations to {mode} users")
+    if mode == "referenced":
+        total = await to_referenced()
+    else:
+        total = await to_embedded()
+    logger.info(f"Migrated {total} participations")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "referenced"))
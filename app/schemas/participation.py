@@ -3,8 +3,11 @@ from typing import Optional
 from enum import Enum
 from datetime import datetime
 
+from typing_extensions import TypedDict
+
 from app.chatbot.steps import Steps
-from app.schemas.user import User
+from app.schemas.user import User, UserDocument
+from app.schemas.tracked import TrackedModel
 
 
 class Status(str, Enum):
@@ -20,7 +23,7 @@ class ParticipationCreation(BaseModel):
     user: User
 
 
-class Participation(BaseModel):
+class Participation(TrackedModel):
     id: str = Field(..., alias="_id")
     user: User
     ticket_url: Optional[str] = None
@@ -47,3 +50,18 @@ class Participation(BaseModel):
             "serial_number": self.serial_number,
             "rejection_reason": self.rejection_reason,
         }
+
+
+class ParticipationDocument(TypedDict, total=False):
+    """A stored participation as returned by read-only endpoints, without building a Participation."""
+    _id: str
+    user: UserDocument
+    ticket_url: Optional[str]
+    ticket_attempts: int
+    priority_number: int
+    datetime: datetime
+    status: Status
+    prize: Optional[str]
+    flow: str
+    serial_number: Optional[str]
+    rejection_reason: Optional[str]
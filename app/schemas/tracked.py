@@ -0,0 +1,68 @@
+import copy
+from abc import abstractmethod
+from pydantic import BaseModel, PrivateAttr
+from typing import Dict, Iterable, Optional
+
+
+def _diff(old: Dict, new: Dict, prefix: str = "") -> Dict:
+    changes = {}
+    for key, value in new.items():
+        path = f"{prefix}{key}"
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict) and previous.keys() <= value.keys():
+            changes.update(_diff(previous, value, f"{path}."))
+        elif key not in old or previous != value:
+            changes[path] = value
+    return changes
+
+
+class TrackedModel(BaseModel):
+    """
+    Remembers the document a model was loaded from, so persistence can $set
+    only the paths that changed since. The document is only compared when
+    changes are asked for, read-only loads never copy it.
+    """
+    _source: Optional[Dict] = PrivateAttr(default=None)
+    _snapshot: Optional[Dict] = PrivateAttr(default=None)
+
+    @classmethod
+    def from_document(cls, document: Dict):
+        instance = cls(**document)
+        instance._source = document
+        return instance
+
+    @abstractmethod
+    def to_dict(self) -> Dict:
+        ...
+
+    def _saved(self) -> Optional[Dict]:
+        if self._snapshot is None and self._source is not None:
+            # Validated again so values compare the way to_dict returns them
+            self._snapshot = type(self)(**self._source).to_dict()
+            self._source = None
+        return self._snapshot
+
+    def mark_clean(self, *fields: str):
+        """Takes the current values as saved, all of them or only fields."""
+        current = copy.deepcopy(self.to_dict())
+        saved = self._saved()
+        if not fields or saved is None:
+            self._snapshot = current
+            return
+        for field in fields:
+            saved[field] = current[field]
+
+    def changes(self, fields: Optional[Iterable[str]] = None) -> Dict:
+        """
+        $set document with the dotted paths modified since the last snapshot,
+        limited to fields when given. Models built by hand have no snapshot
+        and report every field.
+        """
+        current = self.to_dict()
+        current.pop("_id", None)
+        if fields is not None:
+            current = {field: current[field] for field in fields}
+        saved = self._saved()
+        if saved is None:
+            return current
+        return _diff(saved, current)
@@ -1,12 +1,15 @@
 from pydantic import BaseModel, Field
 from typing import Dict, Optional
+from typing_extensions import TypedDict
+
+from app.schemas.tracked import TrackedModel
 
 
 class UserCreation(BaseModel):
     phone: str
 
 
-class User(BaseModel):
+class User(TrackedModel):
     id: str = Field(..., alias="_id")
     phone: str
     terms: Optional[bool] = False
@@ -25,3 +28,14 @@ class User(BaseModel):
             "complete": self.complete,
             "submissions": {str(k): v for k, v in self.submissions.items()}
         }
+
+
+class UserDocument(TypedDict, total=False):
+    """A stored user as returned by read-only endpoints, without building a User."""
+    _id: str
+    phone: str
+    terms: Optional[bool]
+    name: Optional[str]
+    email: Optional[str]
+    complete: bool
+    submissions: Dict[str, int]
@@ -1,6 +1,14 @@
+from typing import Dict, List
+from pydantic import TypeAdapter
+
 from app.schemas import Participation
+from app.schemas.participation import ParticipationDocument
+from app.serializers.user import model_defaults, prepare_user_document
 from app.utils.decorators import convert_id_to_str
 
+participation_documents = TypeAdapter(List[ParticipationDocument])
+_participation_defaults = model_defaults(Participation)
+
 
 def serialize_participation(participation: Participation):
     return {
@@ -20,3 +28,24 @@ def serialize_participation(participation: Participation):
 
 def serialize_participations(participations):
     return [serialize_participation(participation) for participation in participations]
+
+
+def serialize_participation_document(participation: Dict):
+    """Serializes a raw, possibly projected, participation document."""
+    participation["_id"] = str(participation["_id"])
+    return participation
+
+
+def dump_participation_documents(participations: List[Dict]) -> bytes:
+    """
+    Validates raw participation documents and encodes them to JSON in one pass,
+    the read-only equivalent of serialize_participations without the models.
+    """
+    for participation in participations:
+        participation["_id"] = str(participation["_id"])
+        for field, default in _participation_defaults.items():
+            participation.setdefault(field, default)
+        if isinstance(participation.get("user"), dict):
+            prepare_user_document(participation["user"])
+    return participation_documents.dump_json(
+        participation_documents.validate_python(participations))
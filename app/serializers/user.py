@@ -1,9 +1,24 @@
-from typing import List
+from typing import Dict, List
+from pydantic import BaseModel, TypeAdapter
 
 from app.schemas import User
+from app.schemas.user import UserDocument
 from app.utils.decorators import convert_id_to_str
 
 
+def model_defaults(model: type[BaseModel]) -> Dict:
+    """Defaults of the optional fields of model, keyed as stored."""
+    return {
+        field.alias or name: field.get_default(call_default_factory=True)
+        for name, field in model.model_fields.items()
+        if not field.is_required()
+    }
+
+
+user_documents = TypeAdapter(List[UserDocument])
+_user_defaults = model_defaults(User)
+
+
 def serialize_user(user: User):
     return {
         "_id": user.id,
@@ -18,3 +33,18 @@ def serialize_user(user: User):
 
 def serialize_users(users: List[User]):
     return [serialize_user(user) for user in users]
+
+
+def prepare_user_document(user: Dict) -> Dict:
+    if "_id" in user:
+        user["_id"] = str(user["_id"])
+    for field, default in _user_defaults.items():
+        user.setdefault(field, default)
+    return user
+
+
+def dump_user_documents(users: List[Dict]) -> bytes:
+    """Validates raw user documents and encodes them to JSON in one pass."""
+    for user in users:
+        prepare_user_document(user)
+    return user_documents.dump_json(user_documents.validate_python(users))
@@ -0,0 +1,64 @@
+"""
+Measures the per-message overhead of finding the transition for a step and
+routing a response, before any I/O.
+
+    python -m benchmarks.bench_flow_dispatch
+"""
+import re
+import timeit
+
+from app.chatbot.steps import Steps
+from app.chatbot.flow import FLOW, FLOW_GRAPH
+from app.chatbot.graph import Kind
+from app.chatbot.transitions import (
+    normalize_response,
+    WhatsAppTransition,
+    MultimediaUploadTransition,
+    DashboardTransition,
+    ServerTransition,
+)
+
+rounds = 200_000
+response = "Sí acepto ✅"
+flow = "onboarding"
+
+
+def uncompiled():
+    """The lookups FlowManager did before the flow was compiled."""
+    step = Steps(flow)
+    transition = FLOW.get(step, None)
+    if isinstance(transition, WhatsAppTransition):
+        isinstance(transition, MultimediaUploadTransition)
+    elif isinstance(transition, DashboardTransition):
+        pass
+    user_response = re.sub(r'[^\x00-\x7F]+', '', response).lower().strip()
+    next_step = Steps(transition.transitions.get(user_response, flow))
+    transition = FLOW.get(Steps(next_step), transition)
+    isinstance(transition, ServerTransition)
+    args = {}
+    if transition.format_args:
+        count = 1
+        for obj in transition.format_args.available():
+            for param in transition.format_args.get(obj):
+                args[str(count)] = param
+                count += 1
+
+
+def compiled():
+    state = FLOW_GRAPH.state(flow)
+    state.kind == Kind.MULTIMEDIA
+    next_step = state.transition.transitions.get(
+        normalize_response(response), flow)
+    state = FLOW_GRAPH.state(next_step)
+    state.kind == Kind.SERVER
+    args = {key: param for key, _, param in state.format_plan}
+
+
+def main():
+    for name, dispatch in (("uncompiled", uncompiled), ("compiled", compiled)):
+        seconds = min(timeit.repeat(dispatch, number=rounds, repeat=5))
+        print(f"{name:>10}: {seconds / rounds * 1e9:.0f} ns per message")
+
+
+if __name__ == "__main__":
+    main()
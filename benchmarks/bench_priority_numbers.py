@@ -0,0 +1,69 @@
+"""
+Allocates priority numbers from many concurrent completions spread over
+several processes' allocators and checks that, once every allocator is
+closed, the numbers handed out plus the released ones are exactly 1..N.
+
+Run it against a scratch database, it drops the counters collection:
+
+    MONGO_DATABASE=bench python -m benchmarks.bench_priority_numbers
+"""
+import asyncio
+import time
+
+from app.core.services.datetime_mexico import today_key
+from app.core.services.priority_number import PriorityNumberAllocator
+from app.db.db import _MongoClientSingleton, CountersCollection
+
+completions = 1000
+processes = 4
+block_sizes = (10, 50, 200)
+
+
+async def transactional_increment() -> int:
+    """What set_priority_number does with PRIORITY_NUMBER_BLOCK_SIZE=1."""
+    while True:
+        try:
+            async with await _MongoClientSingleton().mongo_client.start_session() as session:
+                async with session.start_transaction():
+                    result = await CountersCollection().find_one_and_update(
+                        {"_id": today_key()},
+                        {"$inc": {"value": 1}},
+                        upsert=True,
+                        session=session,
+                        return_document=True
+                    )
+                    return result["value"]
+        except Exception as e:
+            if not getattr(e, "has_error_label", lambda label: False)("TransientTransactionError"):
+                raise
+
+
+async def check(name: str, numbers, elapsed: float):
+    counter = await CountersCollection().find_one({"_id": today_key()})
+    released = counter.get("released", [])
+    duplicates = len(numbers) - len(set(numbers))
+    gaps = set(range(1, counter["value"] + 1)) - set(numbers) - set(released)
+    print(f"{name:>12}: {completions / elapsed:8.0f} completions/s, "
+          f"{duplicates} duplicates, {len(gaps)} gaps, {len(released)} released")
+
+
+async def main():
+    await CountersCollection().drop()
+    start = time.perf_counter()
+    numbers = await asyncio.gather(*[transactional_increment() for _ in range(completions)])
+    await check("transaction", numbers, time.perf_counter() - start)
+
+    for block_size in block_sizes:
+        await CountersCollection().drop()
+        allocators = [PriorityNumberAllocator(block_size) for _ in range(processes)]
+        start = time.perf_counter()
+        allocated = await asyncio.gather(*[
+            allocators[i % processes].allocate() for i in range(completions)])
+        elapsed = time.perf_counter() - start
+        for allocator in allocators:
+            await allocator.close()
+        await check(f"block {block_size}", [number for _, number in allocated], elapsed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""
+Compares serializing participation lists through the models, as the list
+endpoint used to, with the raw document fast path.
+
+    python -m benchmarks.bench_serialization
+"""
+import copy
+import json
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from app.schemas.participation import Participation
+from app.serializers.participation import serialize_participations, dump_participation_documents
+
+sizes = (10_000, 100_000)
+
+
+def documents(size: int):
+    start = datetime(2024, 5, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "datetime": start + timedelta(seconds=i),
+            "user": {
+                "_id": str(ObjectId()),
+                "phone": f"whatsapp:+521{i:010d}",
+                "terms": True,
+                "name": "Bench User",
+                "email": "bench@example.com",
+                "complete": True,
+                "submissions": {"2024-05-01": 1},
+            },
+            "ticket_url": f"user/{i}",
+            "ticket_attempts": 1,
+            "priority_number": i,
+            "status": "COMPLETE",
+            "prize": None,
+            "flow": "dashboard_waiting",
+        }
+        for i in range(size)
+    ]
+
+
+def models(participations):
+    for participation in participations:
+        participation["_id"] = str(participation["_id"])
+    body = jsonable_encoder(serialize_participations(
+        [Participation(**participation) for participation in participations]))
+    return json.dumps(body).encode()
+
+
+def raw(participations):
+    return dump_participation_documents(participations)
+
+
+def main():
+    for size in sizes:
+        participations = documents(size)
+        for name, serialize in (("models", models), ("raw", raw)):
+            batch = copy.deepcopy(participations)
+            start = time.perf_counter()
+            serialize(batch)
+            elapsed = time.perf_counter() - start
+            print(f"{size:>7} {name:>6}: {elapsed:.2f}s ({size / elapsed:,.0f} participations/s)")
+
+
+if __name__ == "__main__":
+    main()
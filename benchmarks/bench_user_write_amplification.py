@@ -0,0 +1,76 @@
+"""
+Compares the documents written by profile updates with users embedded in
+their participations against users referenced by phone.
+
+Run it against a scratch database, it drops the users and participations
+collections:
+
+    MONGO_DATABASE=bench python -m benchmarks.bench_user_write_amplification
+"""
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.services.datetime_mexico import get_current_datetime
+from app.core.services.users import fetch_user_by_phone, update_user_by_phone, user_reference
+from app.db.db import MongoDatabase, ParticipationsCollection, UsersCollection
+from app.schemas.participation import Status
+
+users = 50
+participations_per_user = 200
+updates_per_user = 5
+
+
+async def documents_updated() -> int:
+    status = await MongoDatabase().command("serverStatus")
+    return status["metrics"]["document"]["updated"]
+
+
+async def seed(mode: str):
+    await UsersCollection().drop()
+    await ParticipationsCollection().drop()
+    await ParticipationsCollection().create_index("user.phone")
+
+    for i in range(users):
+        phone = f"whatsapp:+52100000{i:04d}"
+        result = await UsersCollection().insert_one({
+            "phone": phone, "terms": True, "name": "Bench", "email": None,
+            "complete": True, "submissions": {},
+        })
+        user = (await fetch_user_by_phone(phone)).to_dict()
+        assert str(result.inserted_id) == user["_id"]
+        embedded = user_reference(user) if mode == "referenced" else user
+        await ParticipationsCollection().insert_many([
+            {"datetime": get_current_datetime(), "user": embedded,
+             "status": Status.COMPLETE.value, "serial_number": n}
+            for n in range(participations_per_user)
+        ])
+
+
+async def run(mode: str):
+    settings.PARTICIPATION_USER_MODE = mode
+    await seed(mode)
+
+    start_updated = await documents_updated()
+    start = time.perf_counter()
+    for i in range(users):
+        user = await fetch_user_by_phone(f"whatsapp:+52100000{i:04d}")
+        for n in range(updates_per_user):
+            user.submissions[str(n)] = n
+            user = await update_user_by_phone(user.phone, user)
+    elapsed = time.perf_counter() - start
+    written = await documents_updated() - start_updated
+
+    updates = users * updates_per_user
+    print(f"{mode:>10}: {updates} updates, {written} documents written "
+          f"({written / updates:.1f} per update), {elapsed:.2f}s "
+          f"({elapsed / updates * 1000:.1f} ms per update)")
+
+
+async def main():
+    for mode in ("embedded", "referenced"):
+        await run(mode)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+
+from app.chatbot import conversations
+from app.chatbot.conversations import ConversationExecutor, LeaseLostError
+
+
+@pytest.fixture
+def leases(monkeypatch):
+    owners = {}
+
+    async def acquire_lease(key, owner, seconds):
+        if owners.get(key, owner) != owner:
+            return False
+        owners[key] = owner
+        return True
+
+    async def renew_lease(key, owner, seconds):
+        return owners.get(key) == owner
+
+    async def release_lease(key, owner):
+        if owners.get(key) == owner:
+            del owners[key]
+
+    monkeypatch.setattr(conversations, "acquire_lease", acquire_lease)
+    monkeypatch.setattr(conversations, "renew_lease", renew_lease)
+    monkeypatch.setattr(conversations, "release_lease", release_lease)
+    return owners
+
+
+@pytest.mark.asyncio
+async def test_same_phone_runs_in_arrival_order(leases):
+    executor = ConversationExecutor(30, 0.01, 1)
+    processed = []
+
+    async def handle(phone, n):
+        async with executor.conversation(phone):
+            await asyncio.sleep(0.01 * (5 - n))
+            processed.append((phone, n))
+
+    await asyncio.gather(*[handle("whatsapp:+521", n) for n in range(5)])
+
+    assert processed == [("whatsapp:+521", n) for n in range(5)]
+    assert leases == {}
+
+
+@pytest.mark.asyncio
+async def test_different_phones_run_in_parallel(leases):
+    executor = ConversationExecutor(30, 0.01, 1)
+    running = set()
+    overlap = []
+
+    async def handle(phone):
+        async with executor.conversation(phone):
+            running.add(phone)
+            await asyncio.sleep(0.02)
+            overlap.append(len(running))
+            running.discard(phone)
+
+    await asyncio.gather(handle("whatsapp:+521"), handle("whatsapp:+522"))
+
+    assert max(overlap) == 2
+
+
+@pytest.mark.asyncio
+async def test_lease_held_by_another_worker(leases):
+    first = ConversationExecutor(30, 0.01, 0.05)
+    second = ConversationExecutor(30, 0.01, 0.05)
+
+    assert await first.try_acquire("whatsapp:+521")
+    assert not await second.try_acquire("whatsapp:+521")
+
+    with pytest.raises(TimeoutError):
+        async with second.conversation("whatsapp:+521"):
+            pass
+
+    await first.release("whatsapp:+521")
+    assert await second.try_acquire("whatsapp:+521")
+    await second.release("whatsapp:+521")
+    assert leases == {}
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_stops_the_holder(leases):
+    executor = ConversationExecutor(0.03, 0.01, 1)
+    writes = []
+
+    with pytest.raises(LeaseLostError):
+        async with executor.conversation("whatsapp:+521"):
+            # Another worker takes over once the lease has expired
+            leases["whatsapp:+521"] = "other"
+            await asyncio.sleep(1)
+            writes.append("late")
+
+    assert writes == []
+    assert leases == {"whatsapp:+521": "other"}
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_without_uncancel(leases, monkeypatch):
+    class Task:
+        """Stands in for a Python 3.10 task, which has no uncancel."""
+
+        def __init__(self, task):
+            self.task = task
+
+        def cancel(self, *args):
+            return self.task.cancel(*args)
+
+    holder = Task(asyncio.current_task())
+    monkeypatch.setattr(conversations.asyncio, "current_task", lambda: holder)
+    executor = ConversationExecutor(0.03, 0.01, 1)
+
+    with pytest.raises(LeaseLostError):
+        async with executor.conversation("whatsapp:+521"):
+            leases["whatsapp:+521"] = "other"
+            await asyncio.sleep(1)
+
+
+@pytest.mark.asyncio
+async def test_guard_leaves_other_cancellations_alone(leases):
+    executor = ConversationExecutor(30, 0.01, 1)
+
+    async def hold():
+        async with executor.conversation("whatsapp:+521"):
+            await asyncio.sleep(1)
+
+    task = asyncio.create_task(hold())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert leases == {}
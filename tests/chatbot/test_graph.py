@@ -0,0 +1,41 @@
+import pytest
+
+from app.chatbot.steps import Steps
+from app.chatbot.flow import FLOW, FLOW_GRAPH
+from app.chatbot.graph import FlowGraph, Kind
+from app.chatbot.transitions import ResponseIndependentTransition, ServerTransition
+
+
+def test_flow_graph_states():
+    assert FLOW_GRAPH.state(Steps.ONBOARDING) is FLOW_GRAPH.state("onboarding")
+    assert FLOW_GRAPH.state(Steps.VALIDATE_PHOTO).kind == Kind.MULTIMEDIA
+    assert FLOW_GRAPH.state(Steps.PRIORITY_NUMBER).kind == Kind.SERVER
+    assert FLOW_GRAPH.state(Steps.DASHBOARD_WAITING).kind == Kind.DASHBOARD
+    assert [key for key, _, _ in FLOW_GRAPH.state(Steps.DASHBOARD_CONFIRMATION).format_plan] == [
+        "1", "2", "3", "4"]
+
+    with pytest.raises(ValueError, match="Invalid step"):
+        FLOW_GRAPH.state("complete")
+
+
+def test_flow_graph_normalized_responses():
+    transition = FLOW[Steps.ONBOARDING]
+    assert "si acepto" in transition.transitions
+
+
+def test_flow_graph_rejects_missing_steps():
+    flow = {
+        Steps.ONBOARDING: ResponseIndependentTransition(
+            next_step=Steps.ONBOARDING_NAME, message_template="HX1"),
+    }
+    with pytest.raises(ValueError, match="onboarding leads to missing step onboarding_name"):
+        FlowGraph(flow, entries=[Steps.ONBOARDING])
+
+
+def test_flow_graph_rejects_unreachable_steps():
+    flow = {
+        Steps.ONBOARDING: ServerTransition(transitions=None, message_template="HX1"),
+        Steps.NO_PRIZE: ServerTransition(transitions=None, message_template="HX2"),
+    }
+    with pytest.raises(ValueError, match="no_prize is unreachable"):
+        FlowGraph(flow, entries=[Steps.ONBOARDING])
@@ -0,0 +1,41 @@
+import pytest
+from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.chatbot import messages
+from app.chatbot.messages import get_user_messages
+
+
+@pytest.mark.asyncio
+async def test_history_backfills_pending_bodies(monkeypatch):
+    now = datetime.now(timezone.utc)
+    stored = [
+        {"_id": i, "message_sid": f"SM{i}", "from": "business", "to": "whatsapp:+521",
+         "datetime": now - timedelta(minutes=i)}
+        for i in range(4)
+    ]
+    stored[0].update(text="stored", photo_url=None)
+    saved = {}
+
+    async def fetch_messages(user_id, limit, before):
+        return stored
+
+    async def retrieve_body(message_sid):
+        if message_sid == "SM2":
+            raise RuntimeError("Failed to retrieve message")
+        return f"body {message_sid}", None
+
+    async def save_message_body(id, text, photo_url):
+        saved[id] = text
+
+    monkeypatch.setattr(messages, "fetch_messages", fetch_messages)
+    monkeypatch.setattr(messages, "retrieve_body", retrieve_body)
+    monkeypatch.setattr(messages, "save_message_body", save_message_body)
+    monkeypatch.setattr(settings, "MESSAGE_HISTORY_BACKFILL_LIMIT", 2)
+
+    history = await get_user_messages(str(ObjectId()))
+
+    # Failed and over-the-limit bodies stay pending for app.backfill_messages
+    assert [message["text"] for message in history] == ["stored", "body SM1", None, None]
+    assert saved == {1: "body SM1"}
@@ -0,0 +1,52 @@
+import pytest
+
+from app.chatbot import user_flow
+from app.chatbot.flow import FLOW, FLOW_GRAPH
+from app.chatbot.steps import Steps
+from app.chatbot.user_flow import FlowManager
+from app.core.services.datetime_mexico import get_current_datetime
+from app.core.services.priority_number import CachedCounter
+from app.schemas.participation import Participation
+from app.schemas.prize import Code
+from app.schemas.user import User
+
+
+@pytest.fixture
+def flow_manager():
+    user = User(_id="user1", phone="1234567891", name="Test User",
+                email="test1@example.com")
+    participation = Participation(_id="p1", user=user, datetime=get_current_datetime(),
+                                  prize="100", priority_number=7)
+    return FlowManager(FLOW_GRAPH, user, participation)
+
+
+@pytest.mark.asyncio
+async def test_resolve_format_args_fetches_each_source_once(flow_manager, monkeypatch):
+    calls = []
+
+    async def get_code_by_participation(participation):
+        calls.append("code")
+        return Code(_id="c1", participationId=participation.id, amount=100,
+                    link="https://example.com/c1", code="ABC", taken=True)
+
+    monkeypatch.setattr(user_flow, "get_code_by_participation",
+                        get_code_by_participation)
+
+    args = await flow_manager.resolve_format_args(
+        FLOW[Steps.DASHBOARD_CONFIRMATION].format_args)
+
+    assert args == {"1": "100", "2": "7", "3": "https://example.com/c1", "4": "ABC"}
+    assert calls == ["code"]
+
+
+@pytest.mark.asyncio
+async def test_resolve_format_args_counts_participations(flow_manager, monkeypatch):
+    async def count_participations():
+        return 42
+
+    monkeypatch.setattr(user_flow, "participations_counter",
+                        CachedCounter(lambda date: count_participations(), 5))
+
+    args = await flow_manager.resolve_format_args(FLOW[Steps.ONBOARDING].format_args)
+
+    assert args == {"1": "42"}
@@ -0,0 +1,186 @@
+import asyncio
+import pytest
+from urllib.parse import urlencode
+
+from app.chatbot import conversations, workers
+from app.chatbot.conversations import ConversationExecutor
+from app.chatbot.workers import InboundWorkerPool
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """In-memory stand-in for the inbound queue and conversation leases."""
+    state = {"jobs": [], "handled": [], "owners": {}}
+
+    def add(phone, text):
+        state["jobs"].append({
+            "_id": len(state["jobs"]),
+            "from": phone,
+            "body": urlencode({"From": phone, "Body": text, "SmsMessageSid": f"SM{len(state['jobs'])}"}),
+            "status": "queued",
+            "attempts": 0,
+        })
+    state["add"] = add
+
+    def claimable(job):
+        return job["status"] == "queued" and job.get("retry_at", 0) <= asyncio.get_running_loop().time()
+
+    async def next_conversation(exclude):
+        for job in state["jobs"]:
+            if claimable(job) and job["from"] not in exclude:
+                return job["from"]
+        return None
+
+    async def claim_message(worker, phone):
+        now = asyncio.get_running_loop().time()
+        if any(job["from"] == phone and job["status"] == "queued" and job.get("retry_at", 0) > now
+               for job in state["jobs"]):
+            return None
+        for job in state["jobs"]:
+            if claimable(job) and job["from"] == phone:
+                job["status"] = "processing"
+                job["attempts"] += 1
+                return job
+        return None
+
+    async def complete_message(job):
+        job["status"] = "done"
+
+    async def fail_message(job, error):
+        job["status"] = "queued" if job["attempts"] < 3 else "failed"
+        job["retry_at"] = asyncio.get_running_loop().time() + 0.02
+
+    async def handle_flow(message):
+        await asyncio.sleep(0)
+        if message.body_content.startswith("fail"):
+            raise RuntimeError("Twilio unavailable")
+        state["handled"].append((message.from_number, message.body_content))
+
+    async def queue_stats():
+        return {"depth": sum(job["status"] == "queued" for job in state["jobs"])}
+
+    async def acquire_lease(key, owner, seconds):
+        if state["owners"].get(key, owner) != owner:
+            return False
+        state["owners"][key] = owner
+        return True
+
+    async def renew_lease(key, owner, seconds):
+        return state["owners"].get(key) == owner
+
+    async def release_lease(key, owner):
+        if state["owners"].get(key) == owner:
+            del state["owners"][key]
+
+    for name, value in [
+        ("next_conversation", next_conversation),
+        ("claim_message", claim_message),
+        ("complete_message", complete_message),
+        ("fail_message", fail_message),
+        ("handle_flow", handle_flow),
+        ("queue_stats", queue_stats),
+    ]:
+        monkeypatch.setattr(workers, name, value)
+    monkeypatch.setattr(conversations, "acquire_lease", acquire_lease)
+    monkeypatch.setattr(conversations, "renew_lease", renew_lease)
+    monkeypatch.setattr(conversations, "release_lease", release_lease)
+    executor = ConversationExecutor(30, 0.01, 1)
+    monkeypatch.setattr(workers, "conversation_executor", executor)
+    state["executor"] = executor
+    return state
+
+
+async def drain(pool: InboundWorkerPool, state, timeout: float = 2):
+    pool.start()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while any(job["status"] in ("queued", "processing") for job in state["jobs"]):
+        assert loop.time() < deadline, "queue was not drained"
+        await asyncio.sleep(0.01)
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_worker_survives_lease_errors(queue, monkeypatch):
+    executor = queue["executor"]
+    try_acquire, release = executor.try_acquire, executor.release
+    failures = {"try_acquire": 1, "release": 1}
+
+    async def flaky_try_acquire(phone):
+        if failures["try_acquire"]:
+            failures["try_acquire"] -= 1
+            raise ConnectionError("primary stepped down")
+        return await try_acquire(phone)
+
+    async def flaky_release(phone):
+        try:
+            await release(phone)
+        finally:
+            if failures["release"]:
+                failures["release"] -= 1
+                raise ConnectionError("primary stepped down")
+
+    monkeypatch.setattr(executor, "try_acquire", flaky_try_acquire)
+    monkeypatch.setattr(executor, "release", flaky_release)
+    queue["add"]("whatsapp:+521", "one")
+
+    pool = InboundWorkerPool(1, 0.01)
+    pool.start()
+    await asyncio.sleep(0.1)
+    # The same worker keeps draining after both errors
+    queue["add"]("whatsapp:+521", "two")
+    pool.notify()
+    await drain(pool, queue)
+
+    assert failures == {"try_acquire": 0, "release": 0}
+    assert queue["handled"] == [("whatsapp:+521", "one"), ("whatsapp:+521", "two")]
+
+
+@pytest.mark.asyncio
+async def test_conversations_keep_arrival_order(queue):
+    for n in range(3):
+        queue["add"]("whatsapp:+521", f"first {n}")
+        queue["add"]("whatsapp:+522", f"second {n}")
+
+    await drain(InboundWorkerPool(2, 0.01), queue)
+
+    for phone, prefix in [("whatsapp:+521", "first"), ("whatsapp:+522", "second")]:
+        handled = [text for sender, text in queue["handled"] if sender == phone]
+        assert handled == [f"{prefix} {n}" for n in range(3)]
+    assert queue["owners"] == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_message_is_retried_before_the_next(queue):
+    queue["add"]("whatsapp:+521", "fail")
+    queue["add"]("whatsapp:+521", "after")
+    queue["add"]("whatsapp:+522", "other")
+
+    pool = InboundWorkerPool(1, 0.01)
+    await drain(pool, queue)
+
+    failed = queue["jobs"][0]
+    assert (failed["status"], failed["attempts"]) == ("failed", 3)
+    # The other conversation goes ahead while the failed message waits
+    assert queue["handled"] == [("whatsapp:+522", "other"), ("whatsapp:+521", "after")]
+
+
+@pytest.mark.asyncio
+async def test_worker_stats(queue):
+    queue["add"]("whatsapp:+521", "one")
+    queue["add"]("whatsapp:+521", "fail")
+
+    pool = InboundWorkerPool(1, 0.01)
+    pool.start()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + 2
+    while queue["jobs"][1]["status"] != "failed":
+        assert loop.time() < deadline
+        await asyncio.sleep(0.01)
+
+    stats = await pool.stats()
+    await pool.stop()
+    assert stats["depth"] == 0
+    [worker] = stats["workers"]
+    assert (worker["processed"], worker["failed"]) == (1, 3)
+    assert worker["busy_seconds"] >= 0
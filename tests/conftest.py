@@ -2,6 +2,7 @@ from app.main import app
 from app.db.init_db import init_db
 from app.db.db import MongoDatabase, _MongoClientSingleton
 from app.core.config import settings
+from app.core.services.priority_number import prize_table
 from fastapi.testclient import TestClient
 from typing import Generator
 import pytest_asyncio
@@ -29,6 +30,7 @@ async def clean_db(db):
     await db.users.delete_many({})
     await db.prizes.delete_many({})
     await db.counters.delete_many({})
+    prize_table.clear()
 
     yield
     # Cleanup after each test
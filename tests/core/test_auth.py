@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import pytest
+
+from app.core import auth
+from app.core.auth import create_access_token, get_current_user, get_token_user, invalidate_principal, LoginThrottle
+from app.schemas.auth import DashboardUserInDB
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_caches_principal(monkeypatch):
+    lookups = []
+
+    async def get_user(username):
+        lookups.append(username)
+        return DashboardUserInDB(username=username, role="admin", hashed_password="x")
+
+    monkeypatch.setattr(auth, "get_user", get_user)
+    invalidate_principal("cached")
+    token = create_access_token({"sub": "cached", "role": "admin"})
+
+    assert (await get_current_user(token)).username == "cached"
+    assert (await get_current_user(token)).username == "cached"
+    assert lookups == ["cached"]
+
+    invalidate_principal("cached")
+    await get_current_user(token)
+    assert lookups == ["cached", "cached"]
+    invalidate_principal("cached")
+
+
+@pytest.mark.asyncio
+async def test_get_token_user_trusts_token(monkeypatch):
+    async def get_user(username):
+        raise AssertionError("Read-only endpoints should not look users up")
+
+    monkeypatch.setattr(auth, "get_user", get_user)
+    token = create_access_token({"sub": "reader", "role": "viewer"})
+
+    user = await get_token_user(token)
+    assert (user.username, user.role) == ("reader", "viewer")
+
+    with pytest.raises(auth.HTTPException) as first:
+        await get_token_user("not-a-token")
+    with pytest.raises(auth.HTTPException) as second:
+        await get_token_user("not-a-token")
+    # Each failure raises its own exception, no traceback outlives a request
+    assert first.value is not second.value
+
+
+def test_login_throttle():
+    throttle = LoginThrottle(max_attempts=2, window_seconds=60)
+
+    assert throttle.attempt("admin", "10.0.0.1") == 0
+    assert throttle.attempt("admin", "10.0.0.1") == 0
+    assert 0 < throttle.attempt("admin", "10.0.0.1") <= 60
+    # Other clients and usernames keep their own attempts
+    assert throttle.attempt("admin", "10.0.0.2") == 0
+    assert throttle.attempt("other", "10.0.0.1") == 0
+
+    throttle.reset("admin", "10.0.0.1")
+    assert throttle.attempt("admin", "10.0.0.1") == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_logins_are_throttled(monkeypatch):
+    verified = []
+
+    async def get_user(username):
+        return DashboardUserInDB(username=username, role="admin", hashed_password="x")
+
+    def verify_password(password, hashed_password):
+        verified.append(password)
+        return False
+
+    monkeypatch.setattr(auth, "get_user", get_user)
+    monkeypatch.setattr(auth, "verify_password", verify_password)
+    monkeypatch.setattr(auth, "login_throttle", LoginThrottle(max_attempts=3, window_seconds=60))
+
+    results = await asyncio.gather(
+        *[auth.authenticate_user("admin", f"guess{i}", "10.0.0.1") for i in range(10)],
+        return_exceptions=True,
+    )
+
+    assert len(verified) == 3
+    assert [r.status_code for r in results if isinstance(r, auth.HTTPException)] == [429] * 7
+
+
+@pytest.mark.asyncio
+async def test_password_executor_rejects_when_full(monkeypatch):
+    monkeypatch.setattr(auth.settings, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(auth.settings, "PASSWORD_HASH_MAX_PENDING", 1)
+    release = threading.Event()
+
+    running = [asyncio.create_task(auth.run_in_password_executor(release.wait, 5)) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(auth.HTTPException) as error:
+        await auth.run_in_password_executor(release.wait, 5)
+    assert error.value.status_code == 503
+
+    release.set()
+    await asyncio.gather(*running)
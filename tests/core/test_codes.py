@@ -0,0 +1,35 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.services.codes import claim_code, code_pool
+
+
+@pytest.mark.asyncio
+async def test_claim_code(db: AsyncIOMotorClient, clean_db):
+    await db.codes.delete_many({})
+    code_pool.clear()
+    await db.codes.insert_many([
+        {"amount": 100, "link": f"https://example.com/{i}", "code": f"CODE{i}", "taken": False}
+        for i in range(3)
+    ])
+    await db.codes.insert_one(
+        {"amount": 200, "link": "https://example.com/200", "code": "OTHER", "taken": False})
+
+    # A code taken behind the pool's back is skipped
+    await code_pool.next_id(100)
+    code_pool._ids[100].appendleft((await db.codes.find_one({"code": "CODE0"}))["_id"])
+    await db.codes.update_one({"code": "CODE0"}, {"$set": {"taken": True}})
+
+    participations = [ObjectId() for _ in range(3)]
+    codes = await asyncio.gather(*[claim_code(100, id) for id in participations])
+
+    claimed = [code for code in codes if code]
+    assert len(claimed) == 2
+    assert len({code["_id"] for code in claimed}) == 2
+    assert all(code["amount"] == 100 and code["taken"] for code in claimed)
+    assert {code["participationId"] for code in claimed} < set(participations)
+
+    await db.codes.delete_many({})
+    code_pool.clear()
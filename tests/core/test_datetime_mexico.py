@@ -0,0 +1,20 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from app.core.services.datetime_mexico import DayClock
+
+
+def test_day_clock_rolls_over_at_local_midnight():
+    timezone = ZoneInfo("America/Mexico_City")
+    now = datetime(2024, 5, 1, 23, 59, 59, tzinfo=timezone).timestamp()
+    clock = DayClock(timezone, now=lambda: now)
+
+    assert clock.today_key() == "2024-05-01"
+
+    now += 1
+    assert clock.today_key() == "2024-05-02"
+
+    now += 24 * 60 * 60 - 1
+    assert clock.today_key() == "2024-05-02"
+    now += 1
+    assert clock.today_key() == "2024-05-03"
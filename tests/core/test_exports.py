@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+import pytest
+from datetime import datetime
+from bson import ObjectId
+
+from app.core.services import exports
+from app.core.services.exports import PARTICIPATION_COLUMNS
+
+
+def participations(count):
+    return [
+        {
+            "_id": ObjectId(),
+            "datetime": datetime(2024, 5, 1, 12),
+            "user": {"_id": "user1", "phone": "1234567891", "name": "Test, User"},
+            "status": "COMPLETE",
+            "priority_number": i,
+        }
+        for i in range(count)
+    ]
+
+
+async def cursor(documents):
+    for document in documents:
+        yield document
+
+
+@pytest.mark.asyncio
+async def test_stream_ndjson_in_batches(monkeypatch):
+    monkeypatch.setattr(exports.settings, "EXPORT_BATCH_SIZE", 2)
+    documents = participations(5)
+
+    chunks = [chunk async for chunk in exports._stream(
+        cursor(documents), "ndjson", PARTICIPATION_COLUMNS)]
+
+    assert len(chunks) == 3
+    rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert [row["priority_number"] for row in rows] == list(range(5))
+    assert rows[0]["_id"] == str(documents[0]["_id"])
+    assert rows[0]["datetime"] == "2024-05-01T12:00:00"
+
+
+@pytest.mark.asyncio
+async def test_stream_csv():
+    documents = participations(2)
+
+    chunks = [chunk async for chunk in exports._stream(
+        cursor(documents), "csv", PARTICIPATION_COLUMNS)]
+
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert len(rows) == 2
+    assert rows[0]["user.name"] == "Test, User"
+    assert rows[1]["priority_number"] == "1"
+    assert rows[0]["prize"] == ""
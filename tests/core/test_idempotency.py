@@ -0,0 +1,35 @@
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.services.idempotency import *
+
+
+@pytest.mark.asyncio
+async def test_duplicate_message_sid_returns_cached_response(db: AsyncIOMotorClient, clean_db):
+    await db.processed_messages.delete_many({})
+    sid = "SM00000000000000000000000000000001"
+
+    assert await claim_message_sid(sid) is None
+
+    # A retry while the first delivery is still running
+    cached = await claim_message_sid(sid)
+    assert cached == {"message": "Already received"}
+
+    response = {"message": "Received", "from": "whatsapp:+5210000000000"}
+    await store_response(sid, response)
+
+    cached = await claim_message_sid(sid)
+    assert cached == response
+    assert await db.processed_messages.count_documents({"_id": sid}) == 1
+
+
+@pytest.mark.asyncio
+async def test_released_message_sid_can_be_processed_again(db: AsyncIOMotorClient, clean_db):
+    await db.processed_messages.delete_many({})
+    sid = "SM00000000000000000000000000000002"
+
+    assert await claim_message_sid(sid) is None
+    await release_message_sid(sid)
+    assert await claim_message_sid(sid) is None
+
+    await release_message_sid(sid)
@@ -0,0 +1,50 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.core.services import inbound_queue
+from app.core.services.inbound_queue import QueueStatus, fail_message, retry_delay
+
+
+class Collection:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = Collection()
+    monkeypatch.setattr(inbound_queue, "InboundMessagesCollection", lambda: collection)
+    return collection
+
+
+def test_retry_delay_backs_off(monkeypatch):
+    monkeypatch.setattr(settings, "INBOUND_QUEUE_RETRY_SECONDS", 5)
+    assert [retry_delay(attempts) for attempts in (1, 2, 3)] == [5, 10, 20]
+
+
+@pytest.mark.asyncio
+async def test_fail_message_requeues_with_delay(collection, monkeypatch):
+    monkeypatch.setattr(settings, "INBOUND_QUEUE_MAX_ATTEMPTS", 3)
+    before = datetime.now(timezone.utc)
+
+    await fail_message({"_id": 1, "attempts": 2}, RuntimeError("Twilio unavailable"))
+
+    [(query, update)] = collection.updates
+    assert query == {"_id": 1}
+    assert update["$set"]["status"] == QueueStatus.QUEUED
+    assert update["$set"]["retry_at"] >= before + timedelta(seconds=retry_delay(2))
+
+
+@pytest.mark.asyncio
+async def test_fail_message_gives_up_after_max_attempts(collection, monkeypatch):
+    monkeypatch.setattr(settings, "INBOUND_QUEUE_MAX_ATTEMPTS", 3)
+
+    await fail_message({"_id": 1, "attempts": 3}, RuntimeError("Twilio unavailable"))
+
+    [(_, update)] = collection.updates
+    assert update["$set"]["status"] == QueueStatus.FAILED
+    assert "retry_at" not in update["$set"]
@@ -0,0 +1,19 @@
+import logging
+
+from app.core.services.inventory import CodeInventory
+
+
+def test_code_inventory_claims_and_low_stock(caplog):
+    inventory = CodeInventory(poll_seconds=10, low_stock=2)
+    inventory.counts = {100: {"available": 3, "taken": 0}}
+
+    with caplog.at_level(logging.WARNING):
+        inventory.record_claim(100)
+        assert not caplog.records
+        inventory.record_claim(100)
+        inventory.record_claim(100)
+
+    assert inventory.snapshot() == [{"available": 0, "taken": 3, "amount": 100}]
+    # Warned once when crossing the threshold, not on every claim
+    assert len(caplog.records) == 1
+    assert "Low stock of 100 codes" in caplog.records[0].message
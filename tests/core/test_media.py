@@ -0,0 +1,97 @@
+import os
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.core.config import settings
+from app.core.services.media import stream_media_to_gcp, close_media_session
+
+CHUNK_SIZE = 256 * 1024
+
+
+@pytest_asyncio.fixture
+async def stand_in(monkeypatch):
+    """Local HTTP server playing both Twilio media and the GCS upload API."""
+    state = {"uploads": {}, "ranges": [], "media": {}}
+
+    async def media(request):
+        content_type, content = state["media"][request.match_info["name"]]
+        response = web.StreamResponse(headers={"Content-Type": content_type})
+        await response.prepare(request)
+        for i in range(0, len(content), 10000):
+            await response.write(content[i:i + 10000])
+        await response.write_eof()
+        return response
+
+    async def start_upload(request):
+        assert request.headers["Authorization"] == "Bearer test-token"
+        name = request.query["name"]
+        state["uploads"][name] = bytearray()
+        location = str(request.url.with_path(f"/session/{name}").with_query({}))
+        return web.Response(status=200, headers={"Location": location})
+
+    async def upload_chunk(request):
+        name = request.match_info["name"]
+        content_range = request.headers["Content-Range"]
+        state["ranges"].append(content_range)
+        state["uploads"][name].extend(await request.read())
+        if content_range.endswith("/*"):
+            return web.Response(status=308)
+        return web.json_response({"name": name})
+
+    app = web.Application()
+    app.router.add_get("/media/{name}", media)
+    app.router.add_post("/upload/storage/v1/b/{bucket}/o", start_upload)
+    app.router.add_put("/session/{name:.+}", upload_chunk)
+
+    server = TestServer(app)
+    await server.start_server()
+    monkeypatch.setattr(settings, "GCS_API_URL", str(server.make_url("/")))
+    monkeypatch.setattr(settings, "MEDIA_CHUNK_SIZE", CHUNK_SIZE)
+    state["url"] = server.make_url
+    yield state
+    await close_media_session()
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_media_in_chunks(stand_in):
+    content = os.urandom(CHUNK_SIZE * 2 + 1234)
+    stand_in["media"]["photo"] = ("image/jpeg", content)
+
+    filename = await stream_media_to_gcp(
+        str(stand_in["url"]("/media/photo")), "user/ticket", token="test-token")
+
+    assert filename == "user/ticket.jpg"
+    assert bytes(stand_in["uploads"][filename]) == content
+    total = len(content)
+    assert stand_in["ranges"] == [
+        f"bytes 0-{CHUNK_SIZE - 1}/*",
+        f"bytes {CHUNK_SIZE}-{2 * CHUNK_SIZE - 1}/*",
+        f"bytes {2 * CHUNK_SIZE}-{total - 1}/{total}",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_media_exact_chunk_multiple(stand_in):
+    content = os.urandom(CHUNK_SIZE * 2)
+    stand_in["media"]["photo"] = ("image/png", content)
+
+    filename = await stream_media_to_gcp(
+        str(stand_in["url"]("/media/photo")), "user/ticket", token="test-token")
+
+    assert filename == "user/ticket.png"
+    assert bytes(stand_in["uploads"][filename]) == content
+    assert stand_in["ranges"][-1] == f"bytes {CHUNK_SIZE}-{2 * CHUNK_SIZE - 1}/{2 * CHUNK_SIZE}"
+
+
+@pytest.mark.asyncio
+async def test_stream_media_rejects_invalid_type(stand_in):
+    stand_in["media"]["audio"] = ("audio/ogg", b"not an image")
+
+    with pytest.raises(ValueError, match="Invalid file type"):
+        await stream_media_to_gcp(
+            str(stand_in["url"]("/media/audio")), "user/ticket", token="test-token")
+
+    assert stand_in["uploads"] == {}
@@ -8,6 +8,7 @@ from app.schemas.user import User
 from app.core.services.participations import *
 from app.core.services.priority_number import count_participations
 from app.core.services.users import update_user_by_phone
+from app.migrate_participation_users import to_embedded
 from app.core.services.datetime_mexico import *
 
 
@@ -238,3 +239,83 @@ async def test_update_participation_user_on_user_update(db: AsyncIOMotorClient,
         result = await db.participations.find_one({"_id": ObjectId(id)})
         assert result["user"]["complete"] == True
         assert result["user"]["email"] == user_data["email"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_participations_page(db: AsyncIOMotorClient, clean_db):
+    user_data = {
+        "_id": "user9",
+        "phone": "1234567899",
+        "terms": True,
+        "name": "Test User",
+        "email": "test9@example.com",
+        "complete": False,
+        "submissions": {}
+    }
+    now = get_current_datetime()
+    for _ in range(5):
+        await db.participations.insert_one({
+            "datetime": now,
+            "user": user_data,
+            "status": Status.INCOMPLETE.value
+        })
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = await fetch_participations_page(limit=2, cursor=cursor, fields=["status"])
+        seen.extend(page)
+        assert all("user" not in participation for participation in page)
+        if not cursor:
+            break
+
+    assert len(seen) == 5
+    assert len({participation["_id"] for participation in seen}) == 5
+
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        await fetch_participations_page(limit=2, cursor="not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_referenced_user_participations(db: AsyncIOMotorClient, clean_db, monkeypatch):
+    monkeypatch.setattr(settings, "PARTICIPATION_USER_MODE", "referenced")
+    user_data = {
+        "_id": "user10",
+        "phone": "1234567810",
+        "terms": True,
+        "name": "Test User",
+        "email": "test10@example.com",
+        "complete": False,
+        "submissions": {}
+    }
+    await db.users.insert_one(user_data)
+
+    participation = await create_participation(ParticipationCreation(user=User(**user_data)))
+    assert participation.user.name == "Test User"
+
+    stored = await db.participations.find_one({"_id": ObjectId(participation.id)})
+    assert stored["user"] == {"_id": "user10", "phone": "1234567810"}
+
+    user = participation.user
+    user.name = "Renamed User"
+    await update_user_by_phone(user.phone, user)
+
+    stored = await db.participations.find_one({"_id": ObjectId(participation.id)})
+    assert stored["user"] == {"_id": "user10", "phone": "1234567810"}
+
+    participations = await fetch_participations(phone="1234567810")
+    assert participations[0].user.name == "Renamed User"
+
+
+@pytest.mark.asyncio
+async def test_migrate_participations_to_embedded(db: AsyncIOMotorClient, clean_db):
+    await db.users.insert_one({"phone": "1234567811", "name": "Test User"})
+    await db.participations.insert_many([
+        {"user": {"_id": "user11", "phone": "1234567811"}},
+        {"user": {"_id": "user12", "phone": "1234567812"}},
+    ])
+
+    # Only participations whose user still exists are rewritten
+    assert await to_embedded() == 1
+    stored = await db.participations.find_one({"user.phone": "1234567811"})
+    assert stored["user"]["name"] == "Test User"
@@ -1,9 +1,11 @@
+import asyncio
 import pytest
 import random
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timedelta
 
-from app.core.services.priority_number import set_priority_number, get_prize
+from app.core.services import priority_number
+from app.core.services.priority_number import set_priority_number, get_prize, CachedCounter, PriorityNumberAllocator, PrizeTable, prize_table
 from app.schemas.participation import Participation, Status
 from app.schemas.user import User
 from app.chatbot.steps import Steps
@@ -181,3 +183,152 @@ async def test_set_priority_numbers(db: AsyncIOMotorClient, clean_db):
         participation.priority_number for participation in sample_participations]
 
     assert len(priority_numbers) == len(set(priority_numbers))
+
+
+@pytest.mark.asyncio
+async def test_cached_counter_single_flight():
+    calls = []
+    now = [0.0]
+    loaded = asyncio.Event()
+
+    async def loader(date):
+        calls.append(date)
+        await loaded.wait()
+        return len(calls)
+
+    counter = CachedCounter(loader, ttl_seconds=5, clock=lambda: now[0])
+    readers = [asyncio.create_task(counter.get()) for _ in range(100)]
+    await asyncio.sleep(0)
+    loaded.set()
+    assert await asyncio.gather(*readers) == [1] * 100
+    assert len(calls) == 1
+
+    now[0] = 4.9
+    assert await counter.get() == 1
+    assert len(calls) == 1
+
+    # Stale values are served while a single refresh runs
+    loaded.clear()
+    now[0] = 5
+    assert await counter.get() == 1
+    assert await counter.get() == 1
+    refresh = counter._loading[today_key()]
+    loaded.set()
+    await refresh
+    assert await counter.get() == 2
+    assert len(calls) == 2
+
+    counter.store(today_key(), 10)
+    assert await counter.get() == 10
+
+
+@pytest.mark.asyncio
+async def test_count_participations_ignores_reserved_numbers(monkeypatch):
+    counters = {}
+
+    class Counters:
+        async def find_one(self, query):
+            return counters.get(query["_id"])
+
+    monkeypatch.setattr(priority_number, "CountersCollection", Counters)
+
+    # Two processes reserved blocks of 5 and completed 3 participations
+    counters[today_key()] = {"value": 10, "released": [9, 10], "issued": 3}
+    assert await priority_number.count_participations() == 3
+
+    # Counters written before issued was tracked
+    counters[today_key()] = {"value": 10, "released": [9, 10]}
+    assert await priority_number.count_participations() == 8
+
+
+@pytest.mark.asyncio
+async def test_get_prize_for_day_key(monkeypatch):
+    queries = []
+
+    class Prizes:
+        async def distinct(self, key, query):
+            return [7]
+
+        async def find_one_and_update(self, query, update, session=None):
+            queries.append(query)
+            return {"type": "Test Prize"}
+
+    monkeypatch.setattr(priority_number, "PrizesCollection", Prizes)
+    monkeypatch.setattr(priority_number, "prize_table", PrizeTable(60))
+
+    assert await get_prize(7, day="2024-07-01") == "Test Prize"
+    assert queries == [{"priority_number": 7, "date": "2024-07-01", "taken": False}]
+    assert priority_number.prize_table.day == "2024-07-01"
+
+
+@pytest.mark.asyncio
+async def test_priority_number_allocator_blocks(db: AsyncIOMotorClient, clean_db):
+    first = PriorityNumberAllocator(5)
+    second = PriorityNumberAllocator(5)
+
+    numbers = await asyncio.gather(*[
+        allocator.allocate() for _ in range(3) for allocator in (first, second)])
+    numbers = sorted(number for _, number in numbers)
+    assert numbers == sorted(set(numbers))
+    assert set(numbers) <= set(range(1, 11))
+
+    await first.close()
+    await second.close()
+    counter = await db.counters.find_one({"_id": today_key()})
+    assert counter["value"] == 10
+    assert sorted(numbers + counter["released"]) == list(range(1, 11))
+
+    # Released numbers are handed out before reserving a new block
+    third = PriorityNumberAllocator(5)
+    _, number = await third.allocate()
+    assert number == counter["released"][0]
+
+
+@pytest.mark.asyncio
+async def test_failed_completion_gives_number_back(db: AsyncIOMotorClient, clean_db, monkeypatch):
+    allocator = PriorityNumberAllocator(5)
+    counter = CachedCounter(priority_number.count_participations, ttl_seconds=60)
+    monkeypatch.setattr(priority_number, "priority_numbers", allocator)
+    monkeypatch.setattr(priority_number, "participations_counter", counter)
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("prizes unavailable")
+    monkeypatch.setattr(priority_number, "get_prize", fail)
+
+    user = User(_id="user1", phone="1234567890")
+    inserted_participation = await db.participations.insert_one({
+        "user": user.to_dict(),
+        "datetime": get_current_datetime(),
+        "status": Status.INCOMPLETE.value,
+    })
+    participation = Participation(**{
+        "_id": str(inserted_participation.inserted_id),
+        "user": user,
+        "datetime": get_current_datetime(),
+    })
+
+    with pytest.raises(RuntimeError):
+        await set_priority_number(participation)
+
+    # The reserved number goes to the next completion and is not counted
+    _, number = await allocator.allocate()
+    assert number == 1
+    assert today_key() not in counter._values
+    await allocator.close()
+
+
+@pytest.mark.asyncio
+async def test_prize_table(db: AsyncIOMotorClient, clean_db):
+    await db.prizes.insert_one({
+        "priority_number": 3,
+        "date": today_key(),
+        "type": "Test Prize",
+        "taken": False,
+    })
+
+    assert await get_prize(4) is None
+    assert prize_table.numbers == {3}
+
+    assert await get_prize(3) == "Test Prize"
+    assert await get_prize(3) is None
+    assert prize_table.numbers == set()
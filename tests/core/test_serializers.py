@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from app.schemas.participation import Participation
+from app.schemas.user import User
+from app.serializers.participation import serialize_participations, dump_participation_documents
+from app.serializers.user import serialize_users, dump_user_documents
+
+
+def documents():
+    return [
+        {
+            "_id": ObjectId(),
+            "datetime": datetime(2024, 5, 1, 12),
+            "user": {"_id": "user1", "phone": "1234567891", "name": "Test User",
+                     "terms": True, "complete": True, "submissions": {"2024-05-01": 1}},
+            "status": "COMPLETE",
+            "priority_number": 7,
+            "prize": "100",
+            "unknown": "dropped",
+        },
+        {
+            "_id": ObjectId(),
+            "datetime": datetime(2024, 5, 1, 13),
+            "user": {"_id": "user2", "phone": "1234567892"},
+        },
+    ]
+
+
+def test_dump_participation_documents_matches_models():
+    raw = documents()
+    models = []
+    for document in documents():
+        document["_id"] = str(document["_id"])
+        models.append(Participation(**document))
+    for document, model in zip(raw, models):
+        document["_id"] = ObjectId(model.id)
+
+    expected = jsonable_encoder(serialize_participations(models))
+    assert json.loads(dump_participation_documents(raw)) == expected
+
+
+def test_dump_user_documents_matches_models():
+    users = [{"_id": ObjectId(), "phone": "1234567891", "name": "Test User",
+              "terms": True, "submissions": {"2024-05-01": 1}}]
+    expected = jsonable_encoder(serialize_users(
+        [User(**{**users[0], "_id": str(users[0]["_id"])})]))
+    assert json.loads(dump_user_documents(users)) == expected
@@ -0,0 +1,89 @@
+import pytest
+
+from app.schemas.participation import Participation, Status
+from app.schemas.user import User
+from app.schemas.tracked import TrackedModel
+from app.core.services.datetime_mexico import *
+
+USER = {
+    "_id": "user1",
+    "phone": "1234567891",
+    "terms": True,
+    "name": "Test User",
+    "email": "test1@example.com",
+    "complete": False,
+    "submissions": {"2024-07-01": 1},
+}
+
+
+def test_loaded_user_has_no_changes():
+    user = User.from_document(dict(USER))
+    assert user.changes() == {}
+
+
+def test_user_changes_only_modified_paths():
+    user = User.from_document(dict(USER, submissions={"2024-07-01": 1}))
+    user.name = "Jane Doe"
+    user.submissions["2024-07-02"] = 1
+
+    assert user.changes() == {
+        "name": "Jane Doe",
+        "submissions.2024-07-02": 1,
+    }
+
+    user.mark_clean()
+    assert user.changes() == {}
+
+
+def test_participation_changes_nested_user():
+    participation = Participation.from_document({
+        "_id": "participation1",
+        "user": dict(USER),
+        "datetime": get_current_datetime(),
+    })
+    participation.status = Status.COMPLETE.value
+    participation.user.complete = True
+
+    assert participation.changes() == {
+        "status": Status.COMPLETE.value,
+        "user.complete": True,
+    }
+
+    participation.mark_clean("status")
+    assert participation.changes() == {"user.complete": True}
+
+
+def test_built_model_reports_every_field():
+    user = User(**USER)
+    changes = user.changes()
+
+    assert "_id" not in changes
+    assert changes["phone"] == USER["phone"]
+    assert changes["submissions"] == USER["submissions"]
+
+
+def test_changes_limited_to_fields():
+    user = User.from_document(dict(USER))
+    user.name = "Jane Doe"
+    user.complete = True
+
+    assert user.changes(["complete"]) == {"complete": True}
+
+    user.mark_clean("complete")
+    assert user.changes() == {"name": "Jane Doe"}
+
+
+def test_loaded_model_keeps_source_until_compared():
+    document = dict(USER)
+    user = User.from_document(document)
+    assert user._source is document
+    assert user._snapshot is None
+
+    user.changes()
+    assert user._source is None
+    assert user._snapshot is not None
+
+
+def test_tracked_model_requires_to_dict():
+    with pytest.raises(TypeError):
+        TrackedModel()
@@ -0,0 +1,47 @@
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.schemas.participation import ParticipationCreation, Status
+from app.schemas.user import User
+from app.chatbot.steps import Steps
+from app.core.services.participations import create_participation
+from app.core.services.unit_of_work import UnitOfWork
+
+
+@pytest.mark.asyncio
+async def test_unit_of_work_commits_once(db: AsyncIOMotorClient, clean_db):
+    user_data = {
+        "_id": "user1",
+        "phone": "1234567891",
+        "terms": True,
+        "name": "Test User",
+        "email": "test1@example.com",
+        "complete": False,
+        "submissions": {}
+    }
+    await db.users.insert_one(user_data)
+    user = User.from_document(user_data)
+    participation = await create_participation(ParticipationCreation(user=user))
+
+    unit_of_work = UnitOfWork()
+    unit_of_work.register_user(user)
+    unit_of_work.register_participation(participation)
+
+    user.name = "Renamed User"
+    participation.ticket_url = "user1/ticket"
+    participation.flow = Steps.ONBOARDING_NAME.value
+
+    stored = await db.participations.find_one({"_id": ObjectId(participation.id)})
+    assert stored["flow"] == Steps.ONBOARDING.value
+
+    await unit_of_work.commit()
+
+    stored = await db.participations.find_one({"_id": ObjectId(participation.id)})
+    assert stored["flow"] == Steps.ONBOARDING_NAME.value
+    assert stored["ticket_url"] == "user1/ticket"
+    assert stored["status"] == Status.INCOMPLETE.value
+    stored_user = await db.users.find_one({"phone": "1234567891"})
+    assert stored_user["name"] == "Renamed User"
+    assert user.changes() == {}
+    assert participation.changes() == {}